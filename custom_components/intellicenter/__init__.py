@@ -1,5 +1,7 @@
 """Pentair IntelliCenter Integration."""
 import asyncio
+from datetime import timedelta
+from functools import partial
 import logging
 from typing import Any, Dict, Optional
 
@@ -19,6 +21,8 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import dispatcher
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
 
 from .const import DOMAIN
@@ -70,6 +74,12 @@ PLATFORMS = [
     NUMBER_DOMAIN,
 ]
 
+# the model is saved to disk so that entities are available right away
+# on the next start, before the connection to the system is established
+STORAGE_VERSION = 1
+# interval (in seconds) between two saves of the model, if it has been updated
+SNAPSHOT_SAVE_INTERVAL = 300
+
 # -------------------------------------------------------------------------------------
 
 
@@ -102,7 +112,48 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     }
     model = PoolModel(attributes_map)
 
-    controller = ModelController(entry.data[CONF_HOST], model, loop=hass.loop)
+    # changes are reflected in the UI right away and rolled back if rejected
+    # and the changes requested while disconnected are sent once reconnected
+    controller = ModelController(
+        entry.data[CONF_HOST], model, loop=hass.loop, optimistic=True, journalSize=100
+    )
+
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.unique_id}")
+
+    async def setup_platforms():
+        """Set up platforms."""
+        await asyncio.gather(
+            *[
+                hass.config_entries.async_forward_entry_setup(entry, platform)
+                for platform in PLATFORMS
+            ]
+        )
+
+        # dispatcher.async_dispatcher_send(hass, self.CONNECTION_SIGNAL, True)
+
+    async def unload_platforms():
+        """Unload platforms."""
+        await asyncio.gather(
+            *[
+                hass.config_entries.async_forward_entry_unload(entry, platform)
+                for platform in PLATFORMS
+            ]
+        )
+
+    async def reset_platforms():
+        """Recreate the entities of the platforms, for a model replaced."""
+        await unload_platforms()
+        await setup_platforms()
+
+    # the version of the model last saved to disk
+    saved_version = None
+
+    async def save_if_updated(now=None):
+        """Save the model to disk if it changed since last saved."""
+        nonlocal saved_version
+        if controller.model.version != saved_version:
+            saved_version = controller.model.version
+            await save_snapshot(controller, store)
 
     class Handler(ConnectionHandler):
 
@@ -116,18 +167,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             for object in controller.model:
                 _LOGGER.debug(f"   loaded {object}")
 
-            async def setup_platforms():
-                """Set up platforms."""
-                await asyncio.gather(
-                    *[
-                        hass.config_entries.async_forward_entry_setup(entry, platform)
-                        for platform in PLATFORMS
-                    ]
-                )
-
-                # dispatcher.async_dispatcher_send(hass, self.CONNECTION_SIGNAL, True)
+            # the platforms are already set up if the model came from the snapshot
+            # but their entities are for other objects if the system has changed
+            # (or for another system if the snapshot was discarded)
+            if not from_snapshot:
+                hass.async_create_task(setup_platforms())
+            elif (
+                controller.snapshotDiscarded
+                or set(controller.model.objects) != snapshot_objects
+            ):
+                hass.async_create_task(reset_platforms())
 
-            hass.async_create_task(setup_platforms())
+            hass.async_create_task(save_if_updated())
 
         @callback
         def reconnected(self, controller):
@@ -149,26 +200,60 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             _LOGGER.debug(f"received update for {len(updates)} pool objects")
             dispatcher.async_dispatcher_send(hass, self.UPDATE_SIGNAL, updates)
 
+    # nothing is stored yet on the first start
+    snapshot = await store.async_load()
+    from_snapshot = snapshot is not None and controller.loadSnapshot(snapshot)
+    # the objects the entities are first created for
+    snapshot_objects = set(controller.model.objects)
+
+    # the platforms set up before the connection is made
+    early_setup = None
+
     try:
 
         handler = Handler(controller)
 
-        await handler.start()
-
         hass.data.setdefault(DOMAIN, {})
 
         hass.data[DOMAIN][entry.entry_id] = handler
 
+        if from_snapshot:
+            _LOGGER.info(f"loaded system: '{controller.systemInfo.propName}' from disk")
+            early_setup = hass.async_create_task(setup_platforms())
+
+        await handler.start()
+
+        # the updates are frequent (pumps for example) so the model is saved
+        # at a fixed interval rather than some time after each update
+        entry.async_on_unload(
+            async_track_time_interval(
+                hass, save_if_updated, timedelta(seconds=SNAPSHOT_SAVE_INTERVAL)
+            )
+        )
+
         # subscribe to Home Assistant STOP event to do some cleanup
 
         async def on_hass_stop(event):
             """Stop push updates when hass stops."""
             handler.stop()
+            await save_snapshot(controller, store)
 
-        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, on_hass_stop)
+        # removed when the entry is unloaded, so that a reloaded entry
+        # does not save the model of a stale controller on stop
+        entry.async_on_unload(
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, on_hass_stop)
+        )
 
         return True
     except ConnectionRefusedError as err:
+        # the entry will be set up again from scratch
+        handler.stop()
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        if not hass.data[DOMAIN]:
+            del hass.data[DOMAIN]
+        if early_setup:
+            await early_setup
+            await unload_platforms()
         raise ConfigEntryNotReady from err
 
 
@@ -192,6 +277,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.info(f"unloading integration {entry.entry_id}")
     if handler:
         handler.stop()
+        await save_snapshot(
+            handler.controller,
+            Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.unique_id}"),
+        )
 
     # if it was the last instance of this integration, clear up the DOMAIN entry
     if not hass.data[DOMAIN]:
@@ -200,6 +289,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def save_snapshot(controller: ModelController, store: Store) -> None:
+    """Save the model of a controller to disk."""
+    snapshot = controller.snapshot()
+    if snapshot:
+        await store.async_save(snapshot)
+
+
 # -------------------------------------------------------------------------------------
 
 
@@ -313,9 +409,15 @@ class PoolEntity(Entity):
         """Request changes as key:value pairs to the associated Pool object."""
         # since we don't care about waiting for the response we set waitForResponse to False
         # whatever changes were requested will be reflected as an update if successful
+        # the request is made from the event loop as it may update the model
         # (also I found out there is no event loop in that thread for a Future would fail)
-        self._controller.requestChanges(
-            self._poolObject.objnam, changes, waitForResponse=False
+        self.hass.loop.call_soon_threadsafe(
+            partial(
+                self._controller.requestChanges,
+                self._poolObject.objnam,
+                changes,
+                waitForResponse=False,
+            )
         )
 
     def isUpdated(self, updates: Dict[str, Dict[str, str]]) -> bool:
@@ -8,7 +8,6 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.typing import HomeAssistantType
 
 from custom_components.intellicenter.pyintellicenter.attributes import (
-    BODY_ATTR,
     CIRCUIT_TYPE,
     HEATER_TYPE,
 )
@@ -105,7 +104,7 @@ class HeaterBinarySensor(PoolEntity, BinarySensorEntity):
     ):
         """Initialize."""
         super().__init__(entry, controller, poolObject, **kwargs)
-        self._bodies = set(poolObject[BODY_ATTR].split(" "))
+        self._bodies = set(poolObject.bodies)
         self._attr_icon = "mdi:fire-circle"
 
     @property
@@ -115,8 +114,8 @@ class HeaterBinarySensor(PoolEntity, BinarySensorEntity):
             body = self._controller.model[bodyObjnam]
             if (
                 body[STATUS_ATTR] == "ON"
-                and body[HEATER_ATTR] == self._poolObject.objnam
-                and body[HTMODE_ATTR] != "0"
+                and body.heater == self._poolObject.objnam
+                and body.isHeating
             ):
                 return True
         return False
@@ -60,6 +60,8 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
         host = discovery_info.host
 
         if self._host_already_configured(host):
+            # the system is announcing itself, it is a good time to reconnect to it
+            self._reconnect_now(host)
             return self.async_abort(reason="already_configured")
 
         try:
@@ -141,6 +143,14 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
         finally:
             controller.stop()
 
+    def _reconnect_now(self, host):
+        """Have the systems at that host address reconnect if they are not connected."""
+        for entry in self._async_current_entries():
+            if entry.data.get(CONF_HOST) == host:
+                handler = self.hass.data.get(DOMAIN, {}).get(entry.entry_id)
+                if handler:
+                    handler.reconnectNow()
+
     def _host_already_configured(self, host):
         """Check if we already have a system with the same host address."""
         existing_hosts = {
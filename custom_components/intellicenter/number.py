@@ -15,7 +15,6 @@ from . import PoolEntity
 from .const import DOMAIN
 from homeassistant.const import PERCENTAGE
 from .pyintellicenter import (
-    BODY_ATTR,
     BODY_TYPE,
     CHEM_TYPE,
     PRIM_ATTR,
@@ -39,24 +38,16 @@ async def async_setup_entry(
     numbers = []
 
     object: PoolObject
-    for object in controller.model.objectList:
-        if (
-            object.objtype == CHEM_TYPE
-            and object.subtype == "ICHLOR"
-            and PRIM_ATTR in object.attributes
-        ):
-            bodies = controller.model.getByType(BODY_TYPE)
-            intellichlor_bodies = object[BODY_ATTR].split(" ")
-
-            body: PoolObject
-            for body in bodies:
-                intellichlor_index = intellichlor_bodies.index(body.objnam)
-                attribute_key = None
-                if intellichlor_index == 0:
-                    attribute_key = PRIM_ATTR
-                elif intellichlor_index == 1:
-                    attribute_key = SEC_ATTR
-                if attribute_key is not None:
+    for object in controller.model.getByType(CHEM_TYPE, "ICHLOR"):
+        if PRIM_ATTR in object.attributes:
+            intellichlor_bodies = object.bodies
+
+            # the output for the first body is PRIM, for the second one SEC
+            for (attribute_key, bodyObjnam) in zip(
+                [PRIM_ATTR, SEC_ATTR], intellichlor_bodies
+            ):
+                body = controller.model[bodyObjnam]
+                if body and body.objtype == BODY_TYPE:
                     numbers.append(
                         PoolNumber(
                             entry,
@@ -98,7 +89,7 @@ class PoolNumber(PoolEntity, NumberEntity):
     @property
     def native_value(self) -> float:
         """Return the current value."""
-        return self._poolObject[self._attribute_key]
+        return self._poolObject.getValue(self._attribute_key)
 
     def set_native_value(self, value: float) -> None:
         """Update the current value."""
@@ -66,7 +66,27 @@ from .controller import (
     ModelController,
     SystemInfo,
 )
-from .model import PoolModel, PoolObject
+from .model import (
+    BodyObject,
+    ChemObject,
+    CircuitObject,
+    HeaterObject,
+    PoolModel,
+    PoolObject,
+    PumpObject,
+    ScheduleObject,
+    SensorObject,
+)
+from .protocol import (
+    OVERFLOW_COALESCE,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_REJECT,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_MAINTENANCE,
+    PRIORITY_QUERY,
+    PRIORITY_SUBSCRIPTION,
+    QueueFullError,
+)
 
 __all__ = [
     BaseController,
@@ -76,6 +96,21 @@ __all__ = [
     SystemInfo,
     PoolModel,
     PoolObject,
+    BodyObject,
+    ChemObject,
+    CircuitObject,
+    HeaterObject,
+    PumpObject,
+    ScheduleObject,
+    SensorObject,
+    QueueFullError,
+    OVERFLOW_COALESCE,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_REJECT,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_MAINTENANCE,
+    PRIORITY_QUERY,
+    PRIORITY_SUBSCRIPTION,
     BODY_TYPE,
     CHEM_TYPE,
     CIRCUIT_TYPE,
@@ -452,3 +452,128 @@ ALL_ATTRIBUTES_BY_TYPE = {
     "SYSTIM": SYSTIM_ATTRIBUTES,
     "VALVE": VALVE_ATTRIBUTES,
 }
+
+# every attribute name known, for any type of object
+ALL_ATTRIBUTES = frozenset(
+    {OBJTYP_ATTR, SUBTYP_ATTR}.union(*ALL_ATTRIBUTES_BY_TYPE.values())
+)
+
+# the types of the values of the attributes, as annotated above
+# the panel sends every value as a string, PoolObject decodes them by type
+INT_VALUE = "int"
+FLOAT_VALUE = "float"
+ONOFF_VALUE = "ON/OFF"
+OBJNAM_VALUE = "objnam"  # NULL_OBJNAM for none
+OBJNAM_LIST_VALUE = "objnam list"  # separated by a space
+
+# the type of an attribute for any type of object
+ATTRIBUTE_TYPES = {
+    "ACT1": INT_VALUE,
+    "ACT2": INT_VALUE,
+    "ACT3": INT_VALUE,
+    "ACT4": INT_VALUE,
+    "ALK": INT_VALUE,
+    BODY_ATTR: OBJNAM_LIST_VALUE,
+    "CALC": INT_VALUE,
+    "CALIB": INT_VALUE,
+    "CHLOR": ONOFF_VALUE,
+    CIRCUIT_ATTR: OBJNAM_VALUE,
+    "CIRCUITS": OBJNAM_LIST_VALUE,
+    "COOL": ONOFF_VALUE,
+    "CYACID": INT_VALUE,
+    "DLSTIM": ONOFF_VALUE,
+    "DNTSTP": ONOFF_VALUE,
+    ENABLE_ATTR: ONOFF_VALUE,
+    FEATR_ATTR: ONOFF_VALUE,
+    "FILTER": OBJNAM_VALUE,
+    "FREEZE": ONOFF_VALUE,
+    GPM_ATTR: INT_VALUE,
+    HEATER_ATTR: OBJNAM_VALUE,
+    "HITMP": INT_VALUE,
+    HTMODE_ATTR: INT_VALUE,
+    "HTSRC": OBJNAM_VALUE,
+    LISTORD_ATTR: INT_VALUE,
+    "LOCX": FLOAT_VALUE,
+    "LOCY": FLOAT_VALUE,
+    LOTMP_ATTR: INT_VALUE,
+    LSTTMP_ATTR: INT_VALUE,
+    "MANUAL": INT_VALUE,
+    "MAX": INT_VALUE,
+    "MAXF": INT_VALUE,
+    "MIN": INT_VALUE,
+    "MINF": INT_VALUE,
+    NORMAL_ATTR: ONOFF_VALUE,
+    "OBJLIST": OBJNAM_LIST_VALUE,
+    "ORPHI": ONOFF_VALUE,
+    "ORPLO": ONOFF_VALUE,
+    "ORPSET": INT_VALUE,
+    ORPTNK_ATTR: INT_VALUE,
+    ORPVAL_ATTR: INT_VALUE,
+    PARENT_ATTR: OBJNAM_VALUE,
+    "PHHI": ONOFF_VALUE,
+    "PHLO": ONOFF_VALUE,
+    "PHSET": FLOAT_VALUE,
+    PHTNK_ATTR: INT_VALUE,
+    PHVAL_ATTR: FLOAT_VALUE,
+    "PORT": INT_VALUE,
+    PRIM_ATTR: INT_VALUE,
+    "PRIMFLO": INT_VALUE,
+    "PRIMTIM": INT_VALUE,
+    "PRIOR": INT_VALUE,
+    PWR_ATTR: INT_VALUE,
+    QUALTY_ATTR: FLOAT_VALUE,
+    READY_ATTR: ONOFF_VALUE,
+    RPM_ATTR: INT_VALUE,
+    SALT_ATTR: INT_VALUE,
+    SEC_ATTR: INT_VALUE,
+    "SET": ONOFF_VALUE,
+    "SETPT": INT_VALUE,
+    "SETTMP": INT_VALUE,
+    "SETTMPNC": INT_VALUE,
+    "SHARE": OBJNAM_VALUE,
+    "SINDEX": INT_VALUE,
+    "SINGLE": ONOFF_VALUE,
+    "SPEED": INT_VALUE,
+    STATIC_ATTR: ONOFF_VALUE,
+    STATUS_ATTR: ONOFF_VALUE,
+    SUPER_ATTR: ONOFF_VALUE,
+    "SWIM": ONOFF_VALUE,
+    "SYNC": ONOFF_VALUE,
+    "SYSTIM": INT_VALUE,
+    "TIMZON": INT_VALUE,
+    VACFLO_ATTR: ONOFF_VALUE,
+    VOL_ATTR: INT_VALUE,
+}
+
+# the types that differ from ATTRIBUTE_TYPES, by object type
+# None for an attribute whose value is kept as a string
+ATTRIBUTE_TYPES_BY_TYPE = {
+    CHEM_TYPE: {TIMOUT_ATTR: INT_VALUE},
+    CIRCUIT_TYPE: {TIME_ATTR: INT_VALUE},
+    HEATER_TYPE: {
+        "BOOST": INT_VALUE,
+        DLY_ATTR: INT_VALUE,
+        "START": INT_VALUE,
+        "STOP": INT_VALUE,
+        TIME_ATTR: INT_VALUE,
+    },
+    "PERMIT": {TIMOUT_ATTR: INT_VALUE},
+    PUMP_TYPE: {CIRCUIT_ATTR: INT_VALUE, STATUS_ATTR: INT_VALUE},
+    SCHED_TYPE: {
+        ACT_ATTR: ONOFF_VALUE,
+        # '00001' means "Don't Change"
+        HEATER_ATTR: None,
+    },
+    SENSE_TYPE: {STATUS_ATTR: None},
+    SYSTEM_TYPE: {
+        ACT_ATTR: ONOFF_VALUE,
+        "AVAIL": ONOFF_VALUE,
+        "HEATING": ONOFF_VALUE,
+        "MANHT": ONOFF_VALUE,
+        "TEMPNC": ONOFF_VALUE,
+        "VACTIM": ONOFF_VALUE,
+        "VALVE": ONOFF_VALUE,
+    },
+    "SYSTIM": {"MIN": None},
+    "VALVE": {DLY_ATTR: ONOFF_VALUE},
+}
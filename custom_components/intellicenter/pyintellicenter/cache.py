@@ -0,0 +1,120 @@
+"""Cache of the results of the queries sent to a Pentair system."""
+
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable
+
+_LOGGER = logging.getLogger(__name__)
+
+# how long (in seconds) the result of a query is kept, by query name
+# the results of the queries not listed are not kept
+DEFAULT_QUERY_TTLS = {
+    "GetCircuitTypes": 3600,
+    "GetHardwareDefinition": 3600,
+    "GetConfiguration": 600,
+    "GetCircuitNames": 600,
+}
+
+DEFAULT_QUERY_CACHE_SIZE = 32
+
+# ---------------------------------------------------------------------------
+
+
+class QueryCache:
+    """Keep the results of queries for a limited time.
+
+    Each result expires after the time to live of its query and
+    the least recently used results are evicted beyond maxSize entries.
+    Concurrent requests for the same key share a single fetch.
+    The results are shared between callers and must not be modified.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float] = DEFAULT_QUERY_TTLS,
+        maxSize: int = DEFAULT_QUERY_CACHE_SIZE,
+    ):
+        """Initialize an empty cache."""
+        self._ttls = ttls
+        self._maxSize = maxSize
+
+        # key -> (expiration time, result), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        # key -> the fetch in progress
+        self._inFlight: Dict[Hashable, asyncio.Future] = {}
+
+        # incremented by each invalidation so that a fetch started before
+        # is not stored
+        self._generation = 0
+
+        self._numHits = 0
+        self._numMisses = 0
+        self._numShared = 0
+
+    def __len__(self):
+        """Return the number of results in the cache."""
+        return len(self._entries)
+
+    def ttl(self, queryName: str) -> float:
+        """Return the time to live of the result of a query."""
+        return self._ttls.get(queryName, 0)
+
+    async def get(
+        self, queryName: str, key: Hashable, fetch: Callable[[], Awaitable]
+    ):
+        """Return the result for key, calling fetch() if not in the cache."""
+
+        entry = self._entries.get(key)
+        if entry:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._numHits += 1
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inFlight.get(key)
+        if task:
+            self._numShared += 1
+        else:
+            self._numMisses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inFlight[key] = task
+            generation = self._generation
+            task.add_done_callback(
+                lambda task: self._fetched(queryName, key, generation, task)
+            )
+
+        # a caller giving up does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _fetched(self, queryName: str, key, generation: int, task) -> None:
+        """Store the result of a fetch."""
+        if self._inFlight.get(key) is task:
+            del self._inFlight[key]
+        if task.cancelled() or task.exception() or generation != self._generation:
+            return
+        ttl = self.ttl(queryName)
+        if ttl > 0:
+            self._entries[key] = (time.monotonic() + ttl, task.result())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxSize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Forget all the results."""
+        if self._entries:
+            _LOGGER.debug(f"CACHE: invalidating {len(self._entries)} results")
+        self._entries.clear()
+        self._generation += 1
+
+    @property
+    def stats(self) -> dict:
+        """Return counters about the cache."""
+        return {
+            "size": len(self._entries),
+            "hits": self._numHits,
+            "misses": self._numMisses,
+            "shared": self._numShared,
+        }
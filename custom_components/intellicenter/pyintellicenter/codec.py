@@ -0,0 +1,86 @@
+"""JSON codecs used to encode and decode the messages exchanged with a system.
+
+The fastest library installed (orjson, then msgspec) is used by default,
+the standard json module otherwise.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# ---------------------------------------------------------------------------
+
+
+class JSONCodec:
+    """Encode and decode JSON with the standard library."""
+
+    name = "json"
+
+    def loads(self, data):
+        """Decode a JSON document from str or UTF-8 bytes."""
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """Encode an object into UTF-8 JSON bytes."""
+        return json.dumps(obj).encode()
+
+
+class OrjsonCodec(JSONCodec):
+    """Encode and decode JSON with orjson."""
+
+    name = "orjson"
+
+    def loads(self, data):
+        """Decode a JSON document from str or UTF-8 bytes."""
+        return orjson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """Encode an object into UTF-8 JSON bytes."""
+        return orjson.dumps(obj)
+
+
+class MsgspecCodec(JSONCodec):
+    """Encode and decode JSON with msgspec."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        """Initialize the reusable encoder and decoder."""
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data):
+        """Decode a JSON document from str or UTF-8 bytes."""
+        return self._decoder.decode(data)
+
+    def dumps(self, obj) -> bytes:
+        """Encode an object into UTF-8 JSON bytes."""
+        return self._encoder.encode(obj)
+
+
+# the codecs by name, the first available being the default
+CODECS = {
+    "orjson": OrjsonCodec if orjson else None,
+    "msgspec": MsgspecCodec if msgspec else None,
+    "json": JSONCodec,
+}
+
+
+def getCodec(name: str = None) -> JSONCodec:
+    """Return a codec by name or the fastest one available if name is None."""
+    if name:
+        codecClass = CODECS.get(name)
+        if not codecClass:
+            raise ValueError(f"JSON codec {name} is not available")
+        return codecClass()
+    for codecClass in CODECS.values():
+        if codecClass:
+            return codecClass()
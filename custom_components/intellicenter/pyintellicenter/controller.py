@@ -2,10 +2,13 @@
 
 import asyncio
 from asyncio import Future
+from collections import deque
 from hashlib import blake2b
 import logging
+import random
+import time
 import traceback
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from .attributes import (
     MODE_ATTR,
@@ -17,12 +20,41 @@ from .attributes import (
     SYSTEM_TYPE,
     VER_ATTR,
 )
+from .cache import DEFAULT_QUERY_TTLS, QueryCache
+from .codec import getCodec
+from .journal import DEFAULT_JOURNAL_MAX_AGE, CommandJournal, JournalEntry
 from .model import PoolModel
-from .protocol import ICProtocol
+from .protocol import (
+    DEFAULT_MAX_QUEUE_SIZE,
+    DEFAULT_PRIORITIES,
+    MAX_CHANGES_OBJECTS,
+    MAX_CHANGES_PAYLOAD,
+    OVERFLOW_DROP_OLDEST,
+    ICBufferedProtocol,
+    ICProtocol,
+    QueueFullError,
+)
+from .registry import RequestRegistry, StateWatch
+from .timers import TimerWheel
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.INFO)
 
+# the number of attributes requested at once when subscribing to the model
+# is adapted between these limits (50 is known to work on all systems)
+INITIAL_CHUNK_ATTRIBUTES = 50
+MIN_CHUNK_ATTRIBUTES = 10
+MAX_CHUNK_ATTRIBUTES = 250
+
+# above this number of tracked object types, the objects are discovered
+# with a single request instead of one request per type
+# (so are they if the protocol window can't carry these requests at once)
+MAX_DISCOVERY_REQUESTS = 10
+
+# the response time (in seconds) and size (in bytes) we aim at for each chunk
+CHUNK_TARGET_TIME = 1.0
+CHUNK_MAX_PAYLOAD = 16 * 1024
+
 
 class CommandError(Exception):
     """Represents an error in response to a Pentair request."""
@@ -51,6 +83,7 @@ class SystemInfo:
         self._propName = params[PROPNAME_ATTR]
         self._sw_version = params[VER_ATTR]
         self._mode = params[MODE_ATTR]
+        self._sname = params[SNAME_ATTR]
         # here we compute what is expected to be a unique_id
         # from the internal name of the system object
         h = blake2b(digest_size=8)
@@ -77,6 +110,20 @@ class SystemInfo:
         """Return a unique id for that system."""
         return self._unique_id
 
+    @property
+    def objnam(self):
+        """Return the objnam of the SYSTEM object."""
+        return self._objnam
+
+    def asParams(self) -> dict:
+        """Return the params this system information could be created from."""
+        return {
+            PROPNAME_ATTR: self._propName,
+            VER_ATTR: self._sw_version,
+            MODE_ATTR: self._mode,
+            SNAME_ATTR: self._sname,
+        }
+
     def update(self, updates):
         """Update the object from a set of key/value pairs."""
         _LOGGER.debug(f"updating system info with {updates}")
@@ -106,24 +153,105 @@ def prune(obj):
 class BaseController:
     """A basic controller connecting to a Pentair system."""
 
-    def __init__(self, host, port=6681, loop=None):
-        """Initialize the controller."""
+    def __init__(
+        self,
+        host,
+        port=6681,
+        loop=None,
+        maxInFlight=1,
+        maxQueueSize=DEFAULT_MAX_QUEUE_SIZE,
+        overflowPolicy=OVERFLOW_DROP_OLDEST,
+        writeBufferLimit=None,
+        heartbeatInterval=10,
+        maxMissedPongs=2,
+        requestTimeout=30,
+        bufferedProtocol=False,
+        codec=None,
+        queryTTLs=None,
+        journalSize=0,
+        journalMaxAge=DEFAULT_JOURNAL_MAX_AGE,
+        connectTimeout=10,
+        handshakeTimeout=15,
+    ):
+        """Initialize the controller.
+
+        maxInFlight is the maximum number of requests allowed on the wire
+        at any given time (the protocol adapts within that limit)
+        maxQueueSize is the maximum number of requests waiting to be sent and
+        overflowPolicy what to do when it is reached (see OVERFLOW_ in protocol)
+        writeBufferLimit is the size (in bytes) of the transport write buffer
+        above which requests are held in the queue (default to asyncio's)
+        heartbeatInterval is the idle time (in seconds) after which the system is
+        pinged and maxMissedPongs the number of unanswered pings after which
+        the connection is considered lost
+        requestTimeout is the default time (in seconds) to wait for a response
+        bufferedProtocol selects ICBufferedProtocol, receiving data in place,
+        over the default ICProtocol
+        codec is the name of the JSON library to use ('orjson', 'msgspec' or 'json')
+        by default the fastest one installed
+        queryTTLs overrides how long (in seconds) the results of the
+        queries are cached, by query name (see DEFAULT_QUERY_TTLS in cache)
+        journalSize is the number of changes requested while disconnected
+        kept (for up to journalMaxAge seconds) and sent once reconnected
+        by default (0) these changes fail
+        connectTimeout is the time (in seconds) allowed to open the connection
+        and handshakeTimeout to then retrieve the system information
+        """
         self._host = host
         self._port = port
         self._loop = loop
+        self._maxInFlight = maxInFlight
+        self._maxQueueSize = maxQueueSize
+        self._overflowPolicy = overflowPolicy
+        self._writeBufferLimit = writeBufferLimit
+        self._heartbeatInterval = heartbeatInterval
+        self._maxMissedPongs = maxMissedPongs
+        self._requestTimeout = requestTimeout
+        self._connectTimeout = connectTimeout
+        self._handshakeTimeout = handshakeTimeout
+        self._bufferedProtocol = bufferedProtocol
+        self._codec = getCodec(codec)
 
         self._transport = None
         self._protocol = None
 
         self._diconnectedCallback = None
 
-        self._requests = {}
+        self._systemInfo = None
+
+        # all deadlines run on a single timer wheel
+        self._timers = TimerWheel(loop)
+
+        self._requests = RequestRegistry(self._timers, self._requestTimedOut)
+
+        self._queryCache = QueryCache({**DEFAULT_QUERY_TTLS, **(queryTTLs or {})})
+
+        self._journal = (
+            CommandJournal(self._timers, journalSize, journalMaxAge)
+            if journalSize
+            else None
+        )
 
     @property
     def host(self) -> str:
         """Return the host the controller is connected to."""
         return self._host
 
+    @property
+    def rttStats(self) -> dict:
+        """Return the round trip time statistics of the current connection."""
+        return self._protocol.rttStats if self._protocol else {}
+
+    @property
+    def requestStats(self) -> dict:
+        """Return the counters of the requests sent to the system."""
+        return self._requests.stats
+
+    @property
+    def protocolStats(self) -> dict:
+        """Return the statistics of the current connection (if any)."""
+        return self._protocol.stats if self._protocol else {}
+
     def connection_made(self, protocol, transport):
         """Handle the callback from the protocol."""
         _LOGGER.debug(f"Connection established to {self._host}")
@@ -136,10 +264,36 @@ class BaseController:
 
     async def start(self) -> None:
         """Connect to the Pentair system and retrieves some system information."""
-        self._transport, self._protocol = await self._loop.create_connection(
-            lambda: ICProtocol(self), self._host, self._port
+        await self._connect()
+        await self._fetchSystemInfo()
+
+    async def _connect(self) -> None:
+        """Open the connection to the Pentair system."""
+        # the configuration may have changed while we were not connected
+        self._queryCache.invalidate()
+
+        protocolClass = ICBufferedProtocol if self._bufferedProtocol else ICProtocol
+        self._transport, self._protocol = await asyncio.wait_for(
+            self._loop.create_connection(
+                lambda: protocolClass(
+                    self,
+                    maxWindow=self._maxInFlight,
+                    maxQueueSize=self._maxQueueSize,
+                    overflowPolicy=self._overflowPolicy,
+                    writeBufferLimit=self._writeBufferLimit,
+                    heartbeatInterval=self._heartbeatInterval,
+                    maxMissedPongs=self._maxMissedPongs,
+                    codec=self._codec,
+                ),
+                self._host,
+                self._port,
+            ),
+            self._connectTimeout,
         )
 
+    async def _fetchSystemInfo(self) -> None:
+        """Retrieve the system information."""
+
         # we start by requesting a few attributes from the SYSTEM object
         # and therefore validate that the system connected is indeed a IntelliCenter
         msg = await self.sendCmd(
@@ -153,6 +307,7 @@ class BaseController:
                     }
                 ],
             },
+            timeout=self._handshakeTimeout,
         )
 
         info = msg["objectList"][0]
@@ -161,49 +316,189 @@ class BaseController:
     def stop(self):
         """Stop all activities from this controller and disconnect."""
         if self._transport:
-            for request in self._requests.values():
-                request.cancel()
+            self._requests.cancelAll()
             self._transport.close()
             self._transport = None
             self._protocol = None
 
-    def sendCmd(self, cmd, extra=None, waitForResponse=True) -> Optional[Future]:
+    def sendCmd(
+        self, cmd, extra=None, waitForResponse=True, timeout=None, priority=None
+    ) -> Optional[Future]:
         """
         Send a command with optional extra parameters to the system.
 
         if waitForResponse is True, a Future is created and returned
         so either call resp = await controller.sendCmd(cmd,extra)
         or controller.sendCmd(cmd,extra,waitForResponse=False)
+        if no response is received within timeout seconds (default to the
+        controller's requestTimeout) the Future fails with asyncio.TimeoutError
+        priority (one of the PRIORITY_ classes) defaults to one based on the command
         """
 
         _LOGGER.debug(f"CONTROLLER: sendCmd: {cmd} {extra} {waitForResponse}")
         future = Future() if waitForResponse else None
 
         if self._protocol:
-            msg_id = self._protocol.sendCmd(cmd, extra)
-            self._requests[msg_id] = future
+            try:
+                msg_id = self._protocol.sendCmd(cmd, extra, priority)
+                self._requests.add(msg_id, cmd, future, timeout or self._requestTimeout)
+            except QueueFullError as err:
+                _LOGGER.warning(f"CONTROLLER: {cmd} not sent: {err}")
+                if future:
+                    future.set_exception(err)
         elif future:
-            future.setException(Exception("controller disconnected"))
+            future.set_exception(Exception("controller disconnected"))
+        else:
+            _LOGGER.debug(f"CONTROLLER: {cmd} not sent: controller disconnected")
 
         return future
 
     def requestChanges(
-        self, objnam: str, changes: dict, waitForResponse=True
+        self, objnam: str, changes: dict, waitForResponse=True, priority: int = None
     ) -> Future:
-        """Submit a change for a given object."""
+        """Submit a change for a given object.
+
+        while disconnected, the change is kept in the journal (if enabled)
+        and the Future resolves once it is sent after reconnecting
+        """
+        if self._mustJournal():
+            future = Future() if waitForResponse else None
+            self._journal.record(
+                objnam,
+                changes,
+                DEFAULT_PRIORITIES["SETPARAMLIST"] if priority is None else priority,
+                future,
+            )
+            _LOGGER.debug(f"CONTROLLER: journaled changes {objnam} {changes}")
+            return future
+
         return self.sendCmd(
             "SETPARAMLIST",
             {"objectList": [{"objnam": objnam, "params": changes}]},
             waitForResponse=waitForResponse,
+            priority=priority,
+        )
+
+    def _mustJournal(self) -> bool:
+        """Return True if the changes requested now are to be journaled."""
+        # until the journal is replayed, changes are added to it to keep their order
+        return self._journal is not None and (
+            not self._protocol or len(self._journal) > 0
+        )
+
+    @property
+    def journalStats(self) -> dict:
+        """Return counters about the journal of changes requested while disconnected."""
+        return self._journal.stats if self._journal is not None else {}
+
+    def replayJournal(self) -> None:
+        """Send the changes requested while disconnected."""
+        if not self._journal:
+            # disabled or empty
+            return
+
+        entries = self._journal.drain()
+        _LOGGER.info(f"CONTROLLER: replaying {len(entries)} journaled changes")
+
+        # entries are ordered by priority, then by age
+        byPriority: Dict[int, Dict[str, List[JournalEntry]]] = {}
+        for entry in entries:
+            byPriority.setdefault(entry.priority, {}).setdefault(
+                entry.objnam, []
+            ).append(entry)
+
+        for (priority, byObject) in byPriority.items():
+
+            def replayed(future, byObject=byObject):
+                if future.cancelled():
+                    return
+                results = future.result()
+                for (objnam, objectEntries) in byObject.items():
+                    for entry in objectEntries:
+                        self._journal.replayed(entry, results[objnam])
+
+            self.requestChangesBulk(
+                {
+                    objnam: {entry.key: entry.value for entry in objectEntries}
+                    for (objnam, objectEntries) in byObject.items()
+                },
+                priority=priority,
+            ).add_done_callback(replayed)
+
+    def requestChangesBulk(
+        self, changes: Dict[str, dict], timeout: float = None, priority: int = None
+    ) -> Future:
+        """Submit changes for several objects at once.
+
+        changes maps objnam to the changes for that object. They are sent
+        as few SETPARAMLIST as possible (split when too large) and the
+        returned Future resolves to a dictionary with, for each objnam,
+        the response to its request or the exception it failed with
+        """
+        return asyncio.ensure_future(
+            self._requestChangesBulk(changes, timeout, priority)
         )
 
-    async def getAllObjects(self, attributeList: list):
-        """Return the values of given attributes for all objects in the system."""
+    async def _requestChangesBulk(
+        self, changes: Dict[str, dict], timeout: float = None, priority: int = None
+    ) -> Dict[str, object]:
+        startTime = time.monotonic()
+
+        # split the objects in batches small enough for the system
+        # (see MAX_CHANGES_OBJECTS and MAX_CHANGES_PAYLOAD in protocol)
+        batches = []
+        batch = []
+        batchSize = 0
+        for (objnam, params) in changes.items():
+            item = {"objnam": objnam, "params": params}
+            itemSize = len(self._codec.dumps(item))
+            if batch and (
+                len(batch) >= MAX_CHANGES_OBJECTS
+                or batchSize + itemSize > MAX_CHANGES_PAYLOAD
+            ):
+                batches.append(batch)
+                batch = []
+                batchSize = 0
+            batch.append(item)
+            batchSize += itemSize
+        if batch:
+            batches.append(batch)
+
+        responses = await asyncio.gather(
+            *[
+                self.sendCmd(
+                    "SETPARAMLIST",
+                    {"objectList": batch},
+                    timeout=timeout,
+                    priority=priority,
+                )
+                for batch in batches
+            ],
+            return_exceptions=True,
+        )
+
+        result = {}
+        for (batch, response) in zip(batches, responses):
+            for item in batch:
+                result[item["objnam"]] = response
+
+        _LOGGER.debug(
+            f"CONTROLLER: changed {len(changes)} objects in {len(batches)} requests"
+            f" in {time.monotonic() - startTime:.3f}s"
+        )
+
+        return result
+
+    async def getAllObjects(self, attributeList: list, condition: str = ""):
+        """Return the values of given attributes for all objects in the system.
+
+        condition restricts the objects returned, for example 'OBJTYP=BODY'
+        """
 
         result = await self.sendCmd(
             "GetParamList",
             {
-                "condition": "",
+                "condition": condition,
                 "objectList": [{"objnam": "INCR", "keys": attributeList}],
             },
         )
@@ -212,12 +507,31 @@ class BaseController:
         # might define, we prune the resulting tree from these 'undefined' values
         return prune(result["objectList"])
 
-    async def getQuery(self, queryName: str, arguments: str = ""):
-        """Return the result of a Query."""
-        result = await self.sendCmd(
-            "GetQuery", {"queryName": queryName, "arguments": arguments}
-        )
-        return result["answer"]
+    async def getQuery(self, queryName: str, arguments: str = "", useCache=True):
+        """Return the result of a Query.
+
+        the results of some queries are cached (and must not be modified)
+        unless useCache is False
+        """
+
+        async def fetch():
+            result = await self.sendCmd(
+                "GetQuery", {"queryName": queryName, "arguments": arguments}
+            )
+            return result["answer"]
+
+        if not useCache:
+            return await fetch()
+        return await self._queryCache.get(queryName, (queryName, arguments), fetch)
+
+    @property
+    def queryCacheStats(self) -> dict:
+        """Return counters about the cache of query results."""
+        return self._queryCache.stats
+
+    def invalidateQueries(self) -> None:
+        """Forget the cached results of the queries."""
+        self._queryCache.invalidate()
 
     def getCircuitNames(self):
         """Return the list of circuit names."""
@@ -231,9 +545,9 @@ class BaseController:
             for v in await self.getQuery("GetCircuitTypes")
         }
 
-    def getHardwareDefinition(self):
+    async def getHardwareDefinition(self):
         """Return the full hardware definition of the system."""
-        return prune(self.getQuery("GetHardwareDefinition"))
+        return prune(await self.getQuery("GetHardwareDefinition"))
 
     def getConfiguration(self):
         """Return the current 'configuration' of the system."""
@@ -247,31 +561,52 @@ class BaseController:
         msg is the while message as a dictionary (parsing of the JSON object)
         """
 
-        future = self._requests.pop(msg_id, 0)
+        request = self._requests.pop(msg_id) if response is not None else None
 
-        # here future can be either:
-        #  - 0 if there was no corresponding request matching this response
+        # here request can be either:
+        #  - None if there was no corresponding request matching this response
         #      like in the case of a notification
-        #  - a future is the sender of the request wanted to get the results
-        #  - None is the sender declined to wait for the response (in sendCmd)
+        #  - a request whose future is set if the sender wanted to get the results
+        #  - a request without future if the sender declined to wait (in sendCmd)
 
         _LOGGER.debug(
-            f"CONTROLLER: receivedMessage: {msg_id} {command} {response} {future}"
+            f"CONTROLLER: receivedMessage: {msg_id} {command} {response} {request}"
         )
 
-        if not future == 0:
+        if request:
+            future = request.future
             if future:
-                if response == "200":
+                if future.done():
+                    # like a request cancelled by its sender
+                    pass
+                elif response == "200":
                     future.set_result(msg)
                 else:
                     future.set_exception(CommandError(response))
             else:
                 _LOGGER.debug(f"ignoring response for msg_id {msg_id}")
         elif response is None or response == "200":
+            if response is not None:
+                # like a response received after its request timed out
+                self._requests.orphaned(msg_id)
             self.processMessage(command, msg)
         else:
+            self._requests.orphaned(msg_id)
             _LOGGER.warning(f"CONTROLLER: error {response} : {msg}")
 
+    def requestDropped(self, msg_id: str, exc: Exception) -> None:
+        """Handle the callback from the protocol when a queued request is dropped."""
+        self._requests.fail(msg_id, exc)
+
+    def requestSent(self, msg_id: str) -> None:
+        """Handle the callback from the protocol when a queued request is sent."""
+        self._requests.sent(msg_id)
+
+    def _requestTimedOut(self, msg_id: str) -> None:
+        """Handle a request that did not receive a response in time."""
+        if self._protocol:
+            self._protocol.requestTimedOut(msg_id)
+
     def processMessage(self, command: str, msg):
         """Process a notification message."""
         pass
@@ -288,11 +623,54 @@ class BaseController:
 class ModelController(BaseController):
     """A controller creating and updating a PoolModel."""
 
-    def __init__(self, host, model, port=6681, loop=None):
-        """Initialize the controller."""
-        super().__init__(host, port, loop)
+    def __init__(
+        self,
+        host,
+        model,
+        port=6681,
+        loop=None,
+        optimistic=False,
+        optimisticTimeout=10,
+        **kwargs,
+    ):
+        """Initialize the controller.
+
+        if optimistic is True, the changes requested are applied to the model
+        (and notified) right away, then rolled back if the system rejects them
+        or does not confirm them within optimisticTimeout seconds
+        """
+        super().__init__(host, port, loop, **kwargs)
         self._model: PoolModel = model
 
+        self._optimistic = optimistic
+        self._optimisticTimeout = optimisticTimeout
+        # objnam -> { attribute: (confirmed value, requested value) }
+        self._optimisticChanges: Dict[str, Dict[str, tuple]] = {}
+        self._numConfirmed = 0
+        self._numRolledBack = 0
+
+        # objnam -> the watches waiting for attributes of that object
+        self._watches: Dict[str, List[StateWatch]] = {}
+
+        # number of attributes requested at once when subscribing
+        # adapted at each start from the behavior of the system
+        self._chunkSize = INITIAL_CHUNK_ATTRIBUTES
+
+        self._startupTimings = {}
+
+        # uniqueID of the system the model was loaded from a snapshot, if any
+        self._snapshotID = None
+        # True once a snapshot of another system was discarded by start
+        self._snapshotDiscarded = False
+
+        # the structure of the system (objects and their types) at the last start
+        self._fingerprint = None
+
+        # when not None, the updates are accumulated here instead of being notified
+        self._pendingUpdates = None
+
+        self._startupTraffic = {}
+
         self._updatedCallback = None
 
     @property
@@ -300,48 +678,312 @@ class ModelController(BaseController):
         """Return the model this controller manages."""
         return self._model
 
+    def snapshot(self) -> Optional[dict]:
+        """Return a JSON serializable snapshot of the system and its model.
+
+        None is returned if the system information was never retrieved
+        """
+        if not self._systemInfo:
+            return None
+        return {
+            "uniqueID": self._systemInfo.uniqueID,
+            "systemInfo": {
+                "objnam": self._systemInfo.objnam,
+                "params": self._systemInfo.asParams(),
+            },
+            "model": self._model.snapshot(),
+        }
+
+    def loadSnapshot(self, snapshot: dict) -> bool:
+        """Populate the system information and the model from a snapshot.
+
+        the snapshot is reconciled with the live system when the controller starts
+        return False if the snapshot could not be used
+        """
+        try:
+            systemInfo = SystemInfo(
+                snapshot["systemInfo"]["objnam"], snapshot["systemInfo"]["params"]
+            )
+            if not self._model.loadSnapshot(snapshot["model"]):
+                return False
+        except (KeyError, TypeError) as err:
+            _LOGGER.warning(f"CONTROLLER: ignoring invalid snapshot: {err}")
+            return False
+        self._systemInfo = systemInfo
+        self._snapshotID = systemInfo.uniqueID
+        self._snapshotDiscarded = False
+        _LOGGER.info(
+            f"CONTROLLER: loaded {self._model.numObjects} objects from snapshot"
+        )
+        return True
+
+    @property
+    def snapshotDiscarded(self) -> bool:
+        """Return True if the snapshot loaded was of another system.
+
+        the objects created from it were then replaced when starting
+        """
+        return self._snapshotDiscarded
+
+    @property
+    def startupTimings(self) -> dict:
+        """Return the duration (in seconds) of each phase of the last start."""
+        return self._startupTimings
+
+    @property
+    def startupTraffic(self) -> dict:
+        """Return the number of bytes exchanged during the last start."""
+        return self._startupTraffic
+
+    def _recordTraffic(self) -> None:
+        """Record the bytes exchanged since the connection was made."""
+        if self._protocol:
+            self._startupTraffic = {
+                "sent": self._protocol.bytesSent,
+                "received": self._protocol.bytesReceived,
+            }
+
+    @staticmethod
+    def _fingerprintOf(objects: list) -> str:
+        """Return a digest of the objnam and type of a list of objects."""
+        h = blake2b(digest_size=16)
+        for objnam, objtyp in sorted(
+            (obj["objnam"], obj["params"].get(OBJTYP_ATTR, "")) for obj in objects
+        ):
+            h.update(f"{objnam}={objtyp};".encode())
+        return h.hexdigest()
+
+    async def _getFingerprint(self) -> str:
+        """Return the fingerprint of the structure of the system."""
+        return self._fingerprintOf(await self._discover([OBJTYP_ATTR]))
+
+    async def _discover(self, attributeList: list) -> list:
+        """Return the values of given attributes for the objects the model tracks.
+
+        rather than retrieving every object in the system,
+        one request filtered on its type is issued for each tracked type
+        when the protocol window lets them all go out at once
+        attributeList must include OBJTYP
+        """
+
+        # the SYSTEM object is always needed
+        types = sorted(set(self._model.trackedTypes) | {SYSTEM_TYPE})
+
+        # the filtered requests are only cheaper if they are answered together:
+        # one after the other they take longer than a single request
+        # (the SystemInfo request is always sent alongside and takes a slot)
+        window = self._protocol.window if self._protocol else 1
+        if len(types) <= min(window - 1, MAX_DISCOVERY_REQUESTS):
+            results = await asyncio.gather(
+                *[
+                    self.getAllObjects(attributeList, f"{OBJTYP_ATTR}={objtyp}")
+                    for objtyp in types
+                ]
+            )
+            objects = [obj for result in results for obj in result]
+        else:
+            # when most types are tracked, a single request is cheaper
+            objects = [
+                obj
+                for obj in await self.getAllObjects(attributeList)
+                if obj["params"].get(OBJTYP_ATTR) in types
+            ]
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                f"CONTROLLER: discovered {len(objects)} objects of types {types}"
+                f" in {len(self._codec.dumps(objects))} bytes"
+            )
+
+        return objects
+
+    async def _timed(self, phase: str, coroutine):
+        """Await a coroutine and record its duration as a startup phase."""
+        startTime = time.monotonic()
+        result = await coroutine
+        self._startupTimings[phase] = time.monotonic() - startTime
+        return result
+
     async def start(self):
         """Start the controller, fetch and start monitoring the model."""
-        await super().start()
 
-        # now we retrieve all the objects type, subtype, sname and parent
-        allObjects = await self.getAllObjects(
-            [OBJTYP_ATTR, SUBTYP_ATTR, SNAME_ATTR, PARENT_ATTR]
+        self._startupTimings = {}
+        startTime = time.monotonic()
+
+        await self._timed("connect", self._connect())
+
+        # the system information and the list of objects are independent
+        # so both requests are issued at once
+        # for the objects we retrieve their type, subtype, sname and parent
+        _, allObjects = await asyncio.gather(
+            self._timed("systemInfo", self._fetchSystemInfo()),
+            self._timed(
+                "discovery",
+                self._discover([OBJTYP_ATTR, SUBTYP_ATTR, SNAME_ATTR, PARENT_ATTR]),
+            ),
         )
-        # and process that list into our model
-        self.model.addObjects(allObjects)
 
-        # _LOGGER.debug(f"objects received: {allObjects}")
+        # a snapshot of another system is of no use
+        if self._snapshotID and self._snapshotID != self._systemInfo.uniqueID:
+            _LOGGER.warning("CONTROLLER: snapshot does not match the system, ignored")
+            self._model.clear()
+            self._snapshotDiscarded = True
+        self._snapshotID = None
 
-        _LOGGER.info(f"model now contains {self.model.numObjects} objects")
+        self._discovered(allObjects)
 
         try:
             # now that I have my object loaded in the model
             # build a query to monitors all their relevant attributes
 
-            attributes = self._model.attributesToTrack()
-
-            query = []
-            numAttributes = 0
-            for items in attributes:
-                query.append(items)
-                numAttributes += len(items["keys"])
-                # a query too large can choke the protocol...
-                # we split them in maximum of 50 attributes (arbitrary but seems to work)
-                if numAttributes >= 50:
-                    res = await self.sendCmd("RequestParamList", {"objectList": query})
-                    self._applyUpdates(res["objectList"])
-                    query = []
-                    numAttributes = 0
-            # and issue the remaining elements if any
-            if query:
-                res = await self.sendCmd("RequestParamList", {"objectList": query})
-                self._applyUpdates(res["objectList"])
+            await self._timed(
+                "subscription", self._subscribe(self._model.attributesToTrack())
+            )
 
         except Exception as err:
             traceback.print_exc()
             raise err
 
+        self._startupTimings["total"] = time.monotonic() - startTime
+        self._recordTraffic()
+        _LOGGER.debug(
+            f"CONTROLLER: startup timings {self._startupTimings}"
+            f" traffic {self._startupTraffic}"
+        )
+
+    def _discovered(self, allObjects: list) -> None:
+        """Update the model from the list of all the objects in the system."""
+
+        self._fingerprint = self._fingerprintOf(allObjects)
+
+        # process that list into our model
+        self.model.addObjects(allObjects)
+        # forgetting the objects removed from the system since the last start
+        removed = self.model.retainObjects(obj["objnam"] for obj in allObjects)
+        if removed:
+            _LOGGER.info(f"CONTROLLER: objects {removed} no longer exist")
+
+        # _LOGGER.debug(f"objects received: {allObjects}")
+
+        _LOGGER.info(f"model now contains {self.model.numObjects} objects")
+
+    async def resume(self):
+        """Reconnect to the system, reusing the model from a previous start.
+
+        the objects are only discovered again if the structure of the system
+        has changed and all the changes that happened while disconnected
+        are notified as a single update
+        """
+
+        if self._fingerprint is None:
+            return await self.start()
+
+        self._startupTimings = {}
+        startTime = time.monotonic()
+
+        await self._timed("connect", self._connect())
+
+        _, fingerprint = await asyncio.gather(
+            self._timed("systemInfo", self._fetchSystemInfo()),
+            self._timed("fingerprint", self._getFingerprint()),
+        )
+
+        self._pendingUpdates = {}
+        try:
+            if fingerprint != self._fingerprint:
+                _LOGGER.info("CONTROLLER: system structure has changed")
+                self._discovered(
+                    await self._timed(
+                        "discovery",
+                        self._discover(
+                            [OBJTYP_ATTR, SUBTYP_ATTR, SNAME_ATTR, PARENT_ATTR]
+                        ),
+                    )
+                )
+
+            await self._timed(
+                "subscription", self._subscribe(self._model.attributesToTrack())
+            )
+        finally:
+            updates, self._pendingUpdates = self._pendingUpdates, None
+
+        self._startupTimings["total"] = time.monotonic() - startTime
+        self._recordTraffic()
+        _LOGGER.debug(
+            f"CONTROLLER: resume timings {self._startupTimings}"
+            f" traffic {self._startupTraffic}"
+        )
+
+        if updates and self._updatedCallback:
+            self._updatedCallback(self, updates)
+
+    async def _subscribe(self, attributes: list) -> None:
+        """Fetch and start monitoring attributes, in chunks.
+
+        a query too large can choke the protocol...
+        so the attributes are requested in chunks, sized from the response time
+        and the size of the previous responses, and as many chunks are kept
+        in flight as the protocol window allows
+        """
+
+        pending = deque(attributes)
+        inFlight = set()
+
+        try:
+            while pending or inFlight:
+                window = self._protocol.window if self._protocol else 1
+                while pending and len(inFlight) < window:
+                    query = []
+                    numAttributes = 0
+                    while pending and (
+                        not query
+                        or numAttributes + len(pending[0]["keys"]) <= self._chunkSize
+                    ):
+                        items = pending.popleft()
+                        query.append(items)
+                        numAttributes += len(items["keys"])
+                    inFlight.add(
+                        asyncio.ensure_future(self._requestChunk(query, numAttributes))
+                    )
+                done, inFlight = await asyncio.wait(
+                    inFlight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    # raise the exception if the request failed
+                    task.result()
+        finally:
+            for task in inFlight:
+                task.cancel()
+
+    async def _requestChunk(self, query: list, numAttributes: int) -> None:
+        """Fetch and start monitoring a chunk of attributes."""
+        startTime = time.monotonic()
+        res = await self.sendCmd("RequestParamList", {"objectList": query})
+        elapsed = time.monotonic() - startTime
+
+        self._applyUpdates(res["objectList"])
+
+        self._adaptChunkSize(
+            numAttributes, elapsed, len(self._codec.dumps(res["objectList"]))
+        )
+
+    def _adaptChunkSize(self, numAttributes: int, elapsed: float, size: int) -> None:
+        """Resize the chunks based on how fast the previous one was answered."""
+
+        chunkSize = self._chunkSize
+        if elapsed < CHUNK_TARGET_TIME / 2:
+            chunkSize *= 1.5
+        elif elapsed > CHUNK_TARGET_TIME:
+            chunkSize /= 2
+
+        # and keep the responses under a reasonable size
+        if numAttributes and size:
+            chunkSize = min(chunkSize, CHUNK_MAX_PAYLOAD * numAttributes / size)
+
+        self._chunkSize = int(
+            min(max(chunkSize, MIN_CHUNK_ATTRIBUTES), MAX_CHUNK_ATTRIBUTES)
+        )
+
     def receivedQueryResult(self, queryName: str, answer):
         """Handle the result of all 'getQuery' responses."""
 
@@ -351,22 +993,285 @@ class ModelController(BaseController):
 
         pass
 
+    @property
+    def optimisticStats(self) -> dict:
+        """Return counters about the optimistic changes."""
+        return {
+            "pending": sum(len(keys) for keys in self._optimisticChanges.values()),
+            "confirmed": self._numConfirmed,
+            "rolledBack": self._numRolledBack,
+        }
+
+    def requestChanges(
+        self,
+        objnam: str,
+        changes: dict,
+        waitForResponse=True,
+        waitForState=False,
+        timeout: float = None,
+        priority: int = None,
+    ) -> Future:
+        """Submit a change for a given object.
+
+        in optimistic mode the change is applied to the model immediately
+        if waitForState is True, the Future returned resolves to the object
+        once the system reports the requested values, rather than when
+        the change is acknowledged, or fails with asyncio.TimeoutError after
+        timeout seconds (default to the controller's requestTimeout)
+        """
+        watch = self._watchState(objnam, changes, timeout) if waitForState else None
+        journaled = self._mustJournal()
+
+        # the response is needed to roll back the change if it is rejected
+        future = super().requestChanges(
+            objnam,
+            changes,
+            waitForResponse=waitForResponse or self._optimistic or bool(watch),
+            priority=priority,
+        )
+
+        if self._optimistic:
+            # a journaled change can only be confirmed once replayed
+            # its deadline starts then (see replayJournal)
+            self._applyOptimistic(objnam, changes, withDeadline=not journaled)
+            future.add_done_callback(
+                lambda future: self._optimisticAnswered(objnam, changes, future)
+            )
+
+        if watch:
+            future.add_done_callback(
+                lambda future: self._watchAnswered(watch, future)
+            )
+            return watch.future
+
+        return future if waitForResponse else None
+
+    def _confirmedValue(self, objnam: str, key: str):
+        """Return the last value of an attribute reported by the system."""
+        pending = self._optimisticChanges.get(objnam)
+        if pending and key in pending:
+            return pending[key][0]
+        object = self._model[objnam]
+        return object[key] if object else None
+
+    def _watchState(self, objnam: str, changes: dict, timeout: float) -> StateWatch:
+        """Create a watch resolved when the attributes reach the values requested."""
+        expected = {
+            key: value
+            for (key, value) in changes.items()
+            if self._confirmedValue(objnam, key) != value
+        }
+        watch = StateWatch(objnam, expected, Future())
+        if not expected:
+            # nothing to wait for
+            watch.future.set_result(self._model[objnam])
+        else:
+            self._watches.setdefault(objnam, []).append(watch)
+            self._timers.schedule(
+                ("watch", watch), timeout or self._requestTimeout, self._watchExpired
+            )
+        return watch
+
+    def _removeWatch(self, watch: StateWatch) -> None:
+        """Remove a watch from the index."""
+        self._timers.cancel(("watch", watch))
+        watches = self._watches.get(watch.objnam)
+        if watches and watch in watches:
+            watches.remove(watch)
+            if not watches:
+                del self._watches[watch.objnam]
+
+    def _watchAnswered(self, watch: StateWatch, future: Future) -> None:
+        """Fail a watch if the change it waits for was rejected."""
+        if watch.future.done():
+            return
+        if future.cancelled():
+            self._removeWatch(watch)
+            watch.future.cancel()
+        elif future.exception():
+            self._removeWatch(watch)
+            watch.future.set_exception(future.exception())
+
+    def _watchExpired(self, key) -> None:
+        """Fail a watch whose attributes did not reach the values in time."""
+        watch = key[1]
+        self._removeWatch(watch)
+        if not watch.future.done():
+            watch.future.set_exception(asyncio.TimeoutError())
+
+    def _matchWatches(self, changesAsList: list) -> None:
+        """Resolve the watches whose attributes reached the values expected."""
+        for update in changesAsList:
+            watches = self._watches.get(update["objnam"])
+            if not watches:
+                continue
+            for watch in list(watches):
+                if watch.matches(update["params"]):
+                    self._removeWatch(watch)
+                    if not watch.future.done():
+                        watch.future.set_result(self._model[watch.objnam])
+
+    def replayJournal(self) -> None:
+        """Send the changes requested while disconnected."""
+        if self._optimistic and self._journal:
+            # the optimistic changes still pending are the journaled ones
+            # (the others were answered when the connection was lost)
+            for (objnam, pending) in self._optimisticChanges.items():
+                for key in pending:
+                    self._timers.schedule(
+                        ("optimistic", objnam, key),
+                        self._optimisticTimeout,
+                        self._optimisticExpired,
+                    )
+        super().replayJournal()
+
+    def _applyOptimistic(
+        self, objnam: str, changes: dict, withDeadline: bool = True
+    ) -> None:
+        """Apply a requested change to the model ahead of its confirmation.
+
+        unless withDeadline is False, the change is rolled back if not
+        confirmed within optimisticTimeout seconds
+        only the tracked attributes are applied: the system never reports
+        the value of the others so they could never be confirmed
+        """
+        object = self._model[objnam]
+        if not object:
+            return
+
+        tracked = self._model.trackedAttributes(object.objtype)
+        changes = {key: value for (key, value) in changes.items() if key in tracked}
+        if not changes:
+            return
+
+        pending = self._optimisticChanges.setdefault(objnam, {})
+        for (key, value) in changes.items():
+            # the confirmed value is kept across successive requests
+            confirmed = pending[key][0] if key in pending else object[key]
+            if value == confirmed:
+                pending.pop(key, None)
+                self._timers.cancel(("optimistic", objnam, key))
+                continue
+            pending[key] = (confirmed, value)
+            if withDeadline:
+                self._timers.schedule(
+                    ("optimistic", objnam, key),
+                    self._optimisticTimeout,
+                    self._optimisticExpired,
+                )
+            else:
+                self._timers.cancel(("optimistic", objnam, key))
+        if not pending:
+            del self._optimisticChanges[objnam]
+
+        updates = self._model.updateObject(objnam, dict(changes))
+        if updates:
+            _LOGGER.debug(f"CONTROLLER: optimistic update {objnam} {updates}")
+            self._notifyUpdates({objnam: updates})
+
+    def _optimisticAnswered(self, objnam: str, changes: dict, future: Future) -> None:
+        """Roll back an optimistic change if the system rejected it."""
+        if future.cancelled() or future.exception():
+            self._rollback(objnam, changes)
+
+    def _optimisticExpired(self, key) -> None:
+        """Roll back an optimistic change the system never confirmed."""
+        _, objnam, attribute = key
+        pending = self._optimisticChanges.get(objnam, {})
+        if attribute in pending:
+            self._rollback(objnam, {attribute: pending[attribute][1]})
+
+    def _rollback(self, objnam: str, changes: dict) -> None:
+        """Restore the confirmed values of attributes changed optimistically.
+
+        an attribute is only restored if no other value was requested since
+        and one without a confirmed value is dropped (restored to None)
+        """
+        pending = self._optimisticChanges.get(objnam)
+        if not pending:
+            return
+
+        restore = {}
+        for (key, value) in changes.items():
+            if key in pending and pending[key][1] == value:
+                restore[key] = pending.pop(key)[0]
+                self._timers.cancel(("optimistic", objnam, key))
+        if not pending:
+            del self._optimisticChanges[objnam]
+
+        object = self._model[objnam]
+        if restore and object:
+            self._numRolledBack += len(restore)
+            _LOGGER.info(f"CONTROLLER: rolling back {objnam} to {restore}")
+            updates = self._model.updateObject(objnam, restore)
+            if updates:
+                self._notifyUpdates({objnam: updates})
+
+    def _confirmOptimistic(self, changesAsList: list, updates: dict) -> None:
+        """Settle the optimistic changes the system reported a value for.
+
+        the value reported by the system, already applied to the model,
+        is the one kept whether it confirms or contradicts the change
+        except for the changes still in the journal: the value reported
+        becomes their confirmed value and the requested one is kept
+        """
+        journaled = self._mustJournal()
+        for update in changesAsList:
+            objnam = update["objnam"]
+            pending = self._optimisticChanges.get(objnam)
+            if not pending:
+                continue
+            for (key, value) in update["params"].items():
+                if key in pending and journaled:
+                    requested = pending[key][1]
+                    pending[key] = (value, requested)
+                    self._model.updateObject(objnam, {key: requested})
+                    if key in updates.get(objnam, {}):
+                        # the model keeps the dictionary in its change log
+                        updates[objnam] = {
+                            k: v for (k, v) in updates[objnam].items() if k != key
+                        }
+                        if not updates[objnam]:
+                            del updates[objnam]
+                elif key in pending:
+                    if pending.pop(key)[1] == value:
+                        self._numConfirmed += 1
+                    else:
+                        self._numRolledBack += 1
+                    self._timers.cancel(("optimistic", objnam, key))
+            if not pending:
+                del self._optimisticChanges[objnam]
+
     def _applyUpdates(self, changesAsList):
         """Apply updates received to the model."""
 
         updates = self._model.processUpdates(changesAsList)
 
+        if self._optimisticChanges:
+            self._confirmOptimistic(changesAsList, updates)
+
+        if self._watches:
+            self._matchWatches(changesAsList)
+
+        self._notifyUpdates(updates)
+
+        return updates
+
+    def _notifyUpdates(self, updates: dict) -> None:
+        """Notify the changes made to the model."""
+
         # if an update happens on the SYSTEM object
         # also applies it to our cached SystemInfo
         systemObjnam = self._systemInfo._objnam
         if systemObjnam in updates:
             self._systemInfo.update(updates[systemObjnam])
 
-        if updates and self._updatedCallback:
+        if self._pendingUpdates is not None:
+            for (objnam, changes) in updates.items():
+                self._pendingUpdates.setdefault(objnam, {}).update(changes)
+        elif updates and self._updatedCallback:
             self._updatedCallback(self, updates)
 
-        return updates
-
     def receivedNotifyList(self, changes):
         """Handle the notifications from IntelliCenter when tracked objects are modified."""
 
@@ -393,6 +1298,9 @@ class ModelController(BaseController):
             f"CONTROLLER: received SystemConfig for {len(objectList)} object(s)"
         )
 
+        # the configuration of the system has changed
+        self.invalidateQueries()
+
         # note that here we might create new objects
         self.model.addObjects(objectList)
 
@@ -423,8 +1331,21 @@ class ModelController(BaseController):
 class ConnectionHandler:
     """Helper class to recover the connect/disconnect/reconnect cycle of a controller."""
 
-    def __init__(self, controller, timeBetweenReconnects=30):
-        """Initialize the handler."""
+    def __init__(
+        self,
+        controller,
+        timeBetweenReconnects=30,
+        maxTimeBetweenReconnects=600,
+        firstRetryDelay=2,
+        jitter=0.2,
+    ):
+        """Initialize the handler.
+
+        the first reconnection attempt is made after firstRetryDelay seconds
+        then after timeBetweenReconnects seconds, increasing up to
+        maxTimeBetweenReconnects, each delay being randomly spread by
+        +/- jitter (a fraction of the delay)
+        """
         self._controller = controller
 
         self._starterTask = None
@@ -432,6 +1353,12 @@ class ConnectionHandler:
         self._firstTime = True
 
         self._timeBetweenReconnects = timeBetweenReconnects
+        self._maxTimeBetweenReconnects = maxTimeBetweenReconnects
+        self._firstRetryDelay = firstRetryDelay
+        self._jitter = jitter
+
+        # set to cut the wait before the next attempt short
+        self._wakeUp = asyncio.Event()
 
         controller._diconnectedCallback = self._diconnectedCallback
 
@@ -445,28 +1372,76 @@ class ConnectionHandler:
 
     async def start(self):
         """Start the handler loop."""
-        if not self._starterTask:
+        if not self._starterTask or self._starterTask.done():
             self._starterTask = asyncio.create_task(self._starter())
 
     def _next_delay(self, currentDelay: int) -> int:
         """Compute the delay before the next reconnection attempt.
 
         default is exponential backoff with a 1.5 factor
+        up to maxTimeBetweenReconnects
+        """
+        return min(int(currentDelay * 1.5), self._maxTimeBetweenReconnects)
+
+    def reconnectNow(self):
+        """Attempt to reconnect immediately if waiting to reconnect.
+
+        for example when the system is known to be reachable again
         """
-        return int(currentDelay * 1.5)
+        if self._starterTask and not self._stopped:
+            _LOGGER.debug("reconnection requested")
+            self._wakeUp.set()
+
+    async def _wait(self, delay: float) -> None:
+        """Wait for (about) delay seconds, or until reconnectNow is called."""
+        # spread the attempts of the handlers that lost their system at once
+        delay *= random.uniform(1 - self._jitter, 1 + self._jitter)
+        self.retrying(round(delay, 1))
+        try:
+            await asyncio.wait_for(self._wakeUp.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeUp.clear()
 
     async def _starter(self, initialDelay=0):
         """Attempt to start the controller."""
+        try:
+            await self._startLoop(initialDelay)
+        finally:
+            if self._starterTask is asyncio.current_task():
+                self._starterTask = None
+
+    async def _startLoop(self, initialDelay):
+        """Attempt to start the controller until it succeeds."""
         started = False
         delay = self._timeBetweenReconnects
+        # a first quick attempt, for transient failures
+        nextDelay = None if initialDelay else self._firstRetryDelay
         while not started:
             try:
                 if initialDelay:
-                    self.retrying(delay)
-                    await asyncio.sleep(initialDelay)
+                    await self._wait(initialDelay)
+                    initialDelay = 0
                 _LOGGER.debug("trying to start controller")
 
-                await self._controller.start()
+                try:
+                    if not self._firstTime and hasattr(self._controller, "resume"):
+                        await self._controller.resume()
+                    else:
+                        await self._controller.start()
+                except asyncio.CancelledError:
+                    # the starter itself is being cancelled
+                    task = asyncio.current_task()
+                    if self._stopped or (
+                        hasattr(task, "cancelling") and task.cancelling()
+                    ):
+                        raise
+                    # the connection was lost during the startup
+                    # and its pending requests cancelled
+                    raise ConnectionError("connection lost while starting")
+
+                # the changes requested while disconnected can now be sent
+                self._controller.replayJournal()
 
                 if self._firstTime:
                     self.started(self._controller)
@@ -475,12 +1450,16 @@ class ConnectionHandler:
                     self.reconnected(self._controller)
 
                 started = True
-                self._starterTask = None
             except Exception as err:
-                _LOGGER.error(f"cannot start: {err}")
-                self.retrying(delay)
-                await asyncio.sleep(delay)
-                delay = self._next_delay(delay)
+                _LOGGER.error(f"cannot start: {err!r}")
+                # in case the connection was made but the startup failed
+                self._controller.stop()
+                if nextDelay:
+                    await self._wait(nextDelay)
+                    nextDelay = None
+                else:
+                    await self._wait(delay)
+                    delay = self._next_delay(delay)
 
     def stop(self):
         """Stop the handler and the associated controller."""
@@ -493,13 +1472,16 @@ class ConnectionHandler:
 
     def _diconnectedCallback(self, controller, err):
         """Handle the disconnection of the underlying controller."""
+        # a failure while attempting to start is handled by the starter
+        if self._starterTask and not self._starterTask.done():
+            return
         self.disconnected(controller, err)
         if not self._stopped:
             _LOGGER.error(
                 f"system disconnected  from {self._controller.host} {err if err else ''}"
             )
             self._starterTask = asyncio.create_task(
-                self._starter(self._timeBetweenReconnects)
+                self._starter(self._firstRetryDelay)
             )
 
     def started(self, controller):
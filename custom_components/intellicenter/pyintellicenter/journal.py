@@ -0,0 +1,145 @@
+"""Journal of the changes requested while disconnected from a Pentair system."""
+
+import asyncio
+from asyncio import Future
+from collections import OrderedDict
+import logging
+import time
+from typing import List, Optional
+
+from .protocol import QueueFullError
+from .stats import RollingStats
+from .timers import TimerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_SIZE = 100
+
+# how long (in seconds) a change is kept before being considered stale
+DEFAULT_JOURNAL_MAX_AGE = 300
+
+# ---------------------------------------------------------------------------
+
+
+class JournalEntry:
+    """The latest value requested for an attribute of an object."""
+
+    def __init__(self, objnam: str, key: str, value, priority: int):
+        """Initialize."""
+        self.objnam = objnam
+        self.key = key
+        self.value = value
+        self.priority = priority
+        self.recordedAt = time.monotonic()
+        # the futures of the requests waiting for this change
+        self.futures: List[Future] = []
+
+
+class CommandJournal:
+    """Keep the changes requested while disconnected until they can be sent.
+
+    Only the latest value requested for a given object attribute is kept.
+    An entry is dropped when older than maxAge seconds or, when the journal
+    holds maxSize entries, to make room for a new one (oldest first).
+    The futures of the requests whose changes are dropped are failed.
+    """
+
+    def __init__(
+        self,
+        timers: TimerWheel,
+        maxSize: int = DEFAULT_JOURNAL_SIZE,
+        maxAge: float = DEFAULT_JOURNAL_MAX_AGE,
+    ):
+        """Initialize an empty journal."""
+        self._timers = timers
+        self._maxSize = maxSize
+        self._maxAge = maxAge
+
+        # (objnam, key) -> entry, the least recently requested first
+        self._entries: OrderedDict = OrderedDict()
+
+        self._numRecorded = 0
+        self._numCoalesced = 0
+        self._numExpired = 0
+        self._numDropped = 0
+        self._numReplayed = 0
+
+        # time between a change being requested and the system answering its replay
+        self._latency = RollingStats()
+
+    def __len__(self):
+        """Return the number of changes in the journal."""
+        return len(self._entries)
+
+    def record(
+        self, objnam: str, changes: dict, priority: int, future: Optional[Future]
+    ) -> None:
+        """Record changes for an object, future is resolved when they are replayed."""
+        self._numRecorded += 1
+        for (key, value) in changes.items():
+            entry = JournalEntry(objnam, key, value, priority)
+            previous = self._entries.pop((objnam, key), None)
+            if previous:
+                self._numCoalesced += 1
+                entry.futures = previous.futures
+            if future:
+                entry.futures.append(future)
+            self._entries[(objnam, key)] = entry
+            self._timers.schedule(
+                ("journal", objnam, key), self._maxAge, self._expired
+            )
+
+        while len(self._entries) > self._maxSize:
+            (_, entry) = self._entries.popitem(last=False)
+            self._timers.cancel(("journal", entry.objnam, entry.key))
+            self._numDropped += 1
+            self._fail(entry, QueueFullError("command journal full"))
+
+    def drain(self) -> List[JournalEntry]:
+        """Remove and return all the entries, the most urgent and oldest first."""
+        entries = sorted(
+            self._entries.values(), key=lambda entry: (entry.priority, entry.recordedAt)
+        )
+        for entry in entries:
+            self._timers.cancel(("journal", entry.objnam, entry.key))
+        self._entries.clear()
+        self._numReplayed += len(entries)
+        return entries
+
+    def replayed(self, entry: JournalEntry, response) -> None:
+        """Notify the waiters of an entry of the response to its replay."""
+        self._latency.add(time.monotonic() - entry.recordedAt)
+        for future in entry.futures:
+            if future.done():
+                continue
+            if isinstance(response, BaseException):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
+    def _expired(self, key) -> None:
+        entry = self._entries.pop(key[1:], None)
+        if entry:
+            self._numExpired += 1
+            _LOGGER.info(
+                f"JOURNAL: dropping stale change {entry.objnam} {entry.key}={entry.value}"
+            )
+            self._fail(entry, asyncio.TimeoutError())
+
+    def _fail(self, entry: JournalEntry, exc: Exception) -> None:
+        for future in entry.futures:
+            if not future.done():
+                future.set_exception(exc)
+
+    @property
+    def stats(self) -> dict:
+        """Return counters about the journal."""
+        return {
+            "depth": len(self._entries),
+            "recorded": self._numRecorded,
+            "coalesced": self._numCoalesced,
+            "expired": self._numExpired,
+            "dropped": self._numDropped,
+            "replayed": self._numReplayed,
+            "latency": self._latency.asDict(),
+        }
@@ -1,33 +1,173 @@
 """Model class for storing a Pentair system."""
 
+from collections import deque
 import logging
-from typing import List
+import sys
+from typing import Dict, List, Optional
 
 from .attributes import (
+    ACT_ATTR,
+    ALL_ATTRIBUTES,
     ALL_ATTRIBUTES_BY_TYPE,
+    ATTRIBUTE_TYPES,
+    ATTRIBUTE_TYPES_BY_TYPE,
+    BODY_ATTR,
+    BODY_TYPE,
+    CHEM_TYPE,
+    CIRCUIT_ATTR,
     CIRCUIT_TYPE,
     FEATR_ATTR,
+    FLOAT_VALUE,
+    GPM_ATTR,
+    HEATER_ATTR,
+    HEATER_TYPE,
+    HTMODE_ATTR,
+    INT_VALUE,
+    LOTMP_ATTR,
+    LSTTMP_ATTR,
+    NULL_OBJNAM,
+    OBJNAM_LIST_VALUE,
+    OBJNAM_VALUE,
     OBJTYP_ATTR,
+    ONOFF_VALUE,
+    ORPVAL_ATTR,
     PARENT_ATTR,
+    PHVAL_ATTR,
+    PUMP_TYPE,
+    PWR_ATTR,
+    RPM_ATTR,
+    SALT_ATTR,
+    SCHED_TYPE,
+    SENSE_TYPE,
     SNAME_ATTR,
+    SOURCE_ATTR,
     STATUS_ATTR,
     SUBTYP_ATTR,
+    VOL_ATTR,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# version of the format returned by PoolModel.snapshot
+SNAPSHOT_VERSION = 1
+
+# the number of changes kept by PoolModel for changesSince
+DEFAULT_CHANGE_LOG_SIZE = 1000
+
+# the subtypes of the circuits that are lights
+LIGHT_SUBTYPES = frozenset({"LIGHT", "INTELLI", "GLOW", "GLOWT", "DIMMER", "MAGIC2"})
+
+# the lights supporting color effects
+COLOR_EFFECTS_SUBTYPES = frozenset({"INTELLI", "MAGIC2"})
+
+# the attributes referencing other objects (by a space separated list of objnam)
+# that PoolModel indexes
+REFERENCE_ATTRIBUTES = (BODY_ATTR, CIRCUIT_ATTR, HEATER_ATTR)
+
+# the attributes whose change requires an object to be indexed again
+INDEXED_ATTRIBUTES = {OBJTYP_ATTR, SUBTYP_ATTR, PARENT_ATTR, *REFERENCE_ATTRIBUTES}
+
+# the known attribute names and object types
+# so that all objects share the same strings instead of the decoded ones
+_VOCABULARY = {name: name for name in (*ALL_ATTRIBUTES, *ALL_ATTRIBUTES_BY_TYPE)}
+
+
+def intern(name: str) -> str:
+    """Return the shared instance of an attribute name, object type or objnam."""
+    return _VOCABULARY.get(name) or sys.intern(name)
+
+
+def _decodeOnOff(value: str) -> bool:
+    if value == "ON":
+        return True
+    if value == "OFF":
+        return False
+    raise ValueError(value)
+
+
+def _decodeObjnam(value: str):
+    return None if value == NULL_OBJNAM else intern(value)
+
+
+def _decodeObjnamList(value) -> tuple:
+    # the panel may also send a list of objects
+    elements = value.split() if isinstance(value, str) else value
+    return tuple(
+        intern(elt["objnam"] if isinstance(elt, dict) else elt)
+        for elt in elements
+        if elt != NULL_OBJNAM
+    )
+
+
+_DECODERS_BY_VALUE_TYPE = {
+    INT_VALUE: int,
+    FLOAT_VALUE: float,
+    ONOFF_VALUE: _decodeOnOff,
+    OBJNAM_VALUE: _decodeObjnam,
+    OBJNAM_LIST_VALUE: _decodeObjnamList,
+}
+
+
+def _schema(attributeTypes: dict) -> dict:
+    return {
+        attribute: _DECODERS_BY_VALUE_TYPE[valueType]
+        for (attribute, valueType) in attributeTypes.items()
+        if valueType
+    }
+
+
+# attribute -> the function decoding its value, by object type
+_DEFAULT_SCHEMA = _schema(ATTRIBUTE_TYPES)
+_SCHEMAS = {
+    objtyp: _schema({**ATTRIBUTE_TYPES, **attributeTypes})
+    for (objtyp, attributeTypes) in ATTRIBUTE_TYPES_BY_TYPE.items()
+}
+
+
 # ---------------------------------------------------------------------------
 
 
 class PoolObject:
     """Representation of an object in the Pentair system."""
 
+    # the subclasses don't add any slot
+    # so that the class of an object can change with its OBJTYP
+    __slots__ = (
+        "_objnam",
+        "_objtyp",
+        "_subtyp",
+        "_properties",
+        "_values",
+        "isALight",
+        "supportColorEffects",
+        "isALightShow",
+        "isFeatured",
+    )
+
+    # the values of the STATUS attribute
+    onStatus = "ON"
+    offStatus = "OFF"
+
     def __init__(self, objnam, params):
         """Initialize."""
-        self._objnam = objnam
-        self._objtyp = params.pop(OBJTYP_ATTR)
-        self._subtyp = params.pop(SUBTYP_ATTR, None)
-        self._properties = params
+        self._objnam = intern(objnam)
+        self._objtyp = intern(params[OBJTYP_ATTR])
+        subtyp = params.get(SUBTYP_ATTR)
+        self._subtyp = intern(subtyp) if subtyp else subtyp
+        self._properties = {
+            intern(key): value
+            for (key, value) in params.items()
+            if key != OBJTYP_ATTR and key != SUBTYP_ATTR
+        }
+        self._decodeAll()
+        self._classify()
+
+    def _classify(self) -> None:
+        """Compute the flags depending on OBJTYP, SUBTYP and FEATR."""
+        self.isALight = False
+        self.supportColorEffects = False
+        self.isALightShow = False
+        self.isFeatured = self.getValue(FEATR_ATTR, False)
 
     @property
     def objnam(self):
@@ -54,47 +194,41 @@ class PoolObject:
         """Return the object status."""
         return self._properties.get(STATUS_ATTR)
 
-    @property
-    def offStatus(self) -> str:
-        """Return the value of an OFF status."""
-        return "4" if self.objtype == "PUMP" else "OFF"
-
-    @property
-    def onStatus(self) -> str:
-        """Return the value of an ON status."""
-        return "10" if self.objtype == "PUMP" else "ON"
-
-    @property
-    def isALight(self) -> bool:
-        """Return True is the object is a light."""
-        return self.objtype == CIRCUIT_TYPE and self.subtype in [
-            "LIGHT",
-            "INTELLI",
-            "GLOW",
-            "GLOWT",
-            "DIMMER",
-            "MAGIC2",
-        ]
-
-    @property
-    def supportColorEffects(self) -> bool:
-        """Return True is object is a light that support color effects."""
-        return self.isALight and self.subtype in ["INTELLI", "MAGIC2"]
-
-    @property
-    def isALightShow(self) -> bool:
-        """Return True is the object is a light show."""
-        return self.objtype == CIRCUIT_TYPE and self.subtype == "LITSHO"
-
-    @property
-    def isFeatured(self) -> bool:
-        """Return True is the object is Featured."""
-        return self[FEATR_ATTR] == "ON"
-
     def __getitem__(self, key):
         """Return the value for attribure 'key'."""
         return self._properties.get(key)
 
+    def getValue(self, key, default=None):
+        """Return the decoded value for attribute 'key'.
+
+        int, float, bool (for ON/OFF), objnam (None for NULL_OBJNAM)
+        or tuple of objnams depending on the type of the attribute,
+        the raw string for untyped attributes and default if the attribute
+        is missing or its value could not be decoded.
+        """
+        if key in self._values:
+            return self._values[key]
+        if key in _SCHEMAS.get(self._objtyp, _DEFAULT_SCHEMA):
+            return default
+        return self._properties.get(key, default)
+
+    def _decode(self, key, value, schema) -> None:
+        """Store the decoded value of a typed attribute."""
+        decoder = schema.get(key)
+        if not decoder:
+            return
+        try:
+            self._values[key] = decoder(value)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self._values.pop(key, None)
+
+    def _decodeAll(self) -> None:
+        """Decode the values of all the typed attributes."""
+        self._values = {}
+        schema = _SCHEMAS.get(self._objtyp, _DEFAULT_SCHEMA)
+        for (key, value) in self._properties.items():
+            self._decode(key, value, schema)
+
     def __str__(self):
         """Return a friendly string representation."""
         result = f"{self.objnam} "
@@ -119,25 +253,230 @@ class PoolObject:
         """Update the object from a set of key/value pairs, return the changed attributes."""
 
         changed = {}
+        schema = _SCHEMAS.get(self._objtyp, _DEFAULT_SCHEMA)
 
         for (key, value) in updates.items():
 
-            if key in self._properties:
-                if self._properties[key] == value:
-                    # ignore unchanged existing value
-                    continue
+            # the changes are kept (in the change log) as well as the properties
+            # so they share the attribute names too
+            key = intern(key)
 
             # there are a few case when we receive the type/subtype in an update
             if key == OBJTYP_ATTR:
-                self._objtyp = value
+                if self._objtyp == value:
+                    continue
+                self._objtyp = intern(value)
+                self.__class__ = _OBJECT_CLASSES.get(self._objtyp, PoolObject)
+                schema = None
             elif key == SUBTYP_ATTR:
-                self._subtyp = value
+                if self._subtyp == value:
+                    continue
+                self._subtyp = intern(value) if value else value
+            elif value is None:
+                # the attribute no longer has a known value
+                if key not in self._properties:
+                    continue
+                del self._properties[key]
+                self._values.pop(key, None)
+            elif key in self._properties:
+                if self._properties[key] == value:
+                    # ignore unchanged existing value
+                    continue
+                self._properties[key] = value
+                if schema:
+                    self._decode(key, value, schema)
             else:
                 self._properties[key] = value
+                if schema:
+                    self._decode(key, value, schema)
             changed[key] = value
 
+        if schema is None:
+            # the type of the object changed, so may the type of its attributes
+            self._decodeAll()
+
+        if OBJTYP_ATTR in changed or SUBTYP_ATTR in changed or FEATR_ATTR in changed:
+            self._classify()
+
         return changed
 
+    def asParams(self) -> dict:
+        """Return the object as the params it could be created from."""
+        params = {OBJTYP_ATTR: self._objtyp}
+        if self._subtyp:
+            params[SUBTYP_ATTR] = self._subtyp
+        params.update(self._properties)
+        return params
+
+
+class BodyObject(PoolObject):
+    """A body of water (pool or spa)."""
+
+    __slots__ = ()
+
+    @property
+    def temperature(self):
+        """Return the last recorded temperature."""
+        return self.getValue(LSTTMP_ATTR)
+
+    @property
+    def setPoint(self):
+        """Return the desired temperature."""
+        return self.getValue(LOTMP_ATTR)
+
+    @property
+    def heater(self):
+        """Return the objnam of the heater selected for the body, if any."""
+        return self.getValue(HEATER_ATTR)
+
+    @property
+    def isHeating(self) -> bool:
+        """Return True if the body is currently being heated."""
+        return bool(self.getValue(HTMODE_ATTR))
+
+    @property
+    def volume(self):
+        """Return the volume in gallons."""
+        return self.getValue(VOL_ATTR)
+
+
+class CircuitObject(PoolObject):
+    """A circuit (including lights, light shows and features)."""
+
+    __slots__ = ()
+
+    def _classify(self) -> None:
+        """Compute the flags depending on OBJTYP, SUBTYP and FEATR."""
+        super()._classify()
+        self.isALight = self.subtype in LIGHT_SUBTYPES
+        self.supportColorEffects = self.subtype in COLOR_EFFECTS_SUBTYPES
+        self.isALightShow = self.subtype == "LITSHO"
+
+    @property
+    def isOn(self) -> bool:
+        """Return True if the circuit is on."""
+        return self.getValue(STATUS_ATTR, False)
+
+
+class ChemObject(PoolObject):
+    """A chemistry controller (IntelliChlor or IntelliChem)."""
+
+    __slots__ = ()
+
+    @property
+    def isIntelliChlor(self) -> bool:
+        """Return True if the object is an IntelliChlor."""
+        return self.subtype == "ICHLOR"
+
+    @property
+    def isIntelliChem(self) -> bool:
+        """Return True if the object is an IntelliChem."""
+        return self.subtype == "ICHEM"
+
+    @property
+    def bodies(self) -> tuple:
+        """Return the objnams of the bodies managed."""
+        return self.getValue(BODY_ATTR, ())
+
+    @property
+    def ph(self):
+        """Return the pH level."""
+        return self.getValue(PHVAL_ATTR)
+
+    @property
+    def orp(self):
+        """Return the ORP level."""
+        return self.getValue(ORPVAL_ATTR)
+
+    @property
+    def salt(self):
+        """Return the salt level."""
+        return self.getValue(SALT_ATTR)
+
+
+class HeaterObject(PoolObject):
+    """A heater."""
+
+    __slots__ = ()
+
+    @property
+    def bodies(self) -> tuple:
+        """Return the objnams of the bodies the heater serves."""
+        return self.getValue(BODY_ATTR, ())
+
+
+class PumpObject(PoolObject):
+    """A pump."""
+
+    __slots__ = ()
+
+    onStatus = "10"
+    offStatus = "4"
+
+    @property
+    def isOn(self) -> bool:
+        """Return True if the pump is running."""
+        return self.status == self.onStatus
+
+    @property
+    def rpm(self):
+        """Return the rotation per minute, when applicable."""
+        return self.getValue(RPM_ATTR)
+
+    @property
+    def gpm(self):
+        """Return the gallons per minute, when applicable."""
+        return self.getValue(GPM_ATTR)
+
+    @property
+    def power(self):
+        """Return the power usage in Watts, when applicable."""
+        return self.getValue(PWR_ATTR)
+
+
+class ScheduleObject(PoolObject):
+    """A schedule."""
+
+    __slots__ = ()
+
+    @property
+    def circuit(self):
+        """Return the objnam of the circuit controlled by the schedule."""
+        return self.getValue(CIRCUIT_ATTR)
+
+    @property
+    def isActive(self) -> bool:
+        """Return True if the schedule is currently active."""
+        return self.getValue(ACT_ATTR, False)
+
+
+class SensorObject(PoolObject):
+    """A temperature sensor."""
+
+    __slots__ = ()
+
+    @property
+    def reading(self):
+        """Return the calibrated reading of the sensor."""
+        return self.getValue(SOURCE_ATTR)
+
+
+# the class of the objects, by object type
+_OBJECT_CLASSES = {
+    BODY_TYPE: BodyObject,
+    CHEM_TYPE: ChemObject,
+    CIRCUIT_TYPE: CircuitObject,
+    HEATER_TYPE: HeaterObject,
+    PUMP_TYPE: PumpObject,
+    SCHED_TYPE: ScheduleObject,
+    SENSE_TYPE: SensorObject,
+}
+
+
+def createObject(objnam: str, params: dict) -> PoolObject:
+    """Return a new object of the class matching its type."""
+    return _OBJECT_CLASSES.get(params[OBJTYP_ATTR], PoolObject)(objnam, params)
+
 
 # ---------------------------------------------------------------------------
 
@@ -145,12 +484,39 @@ class PoolObject:
 class PoolModel:
     """Representation of a subset of the underlying Pentair system."""
 
-    def __init__(self, attributeMap=ALL_ATTRIBUTES_BY_TYPE):
+    def __init__(
+        self,
+        attributeMap=ALL_ATTRIBUTES_BY_TYPE,
+        changeLogSize: int = DEFAULT_CHANGE_LOG_SIZE,
+    ):
         """Initialize."""
         self._objects: dict[str, PoolObject] = {}
         self._systemObject: PoolObject = None
         self._attributeMap = attributeMap
 
+        # the indexes map a key to the objects (by objnam) with that key
+        # type -> objects and (type, subtype) -> objects
+        self._byType: Dict[object, Dict[str, PoolObject]] = {}
+        # parent objnam -> objects
+        self._byParent: Dict[str, Dict[str, PoolObject]] = {}
+        # (attribute, referenced objnam) -> objects
+        self._byReference: Dict[tuple, Dict[str, PoolObject]] = {}
+        # objnam -> the keys of each index an object was indexed with
+        self._indexKeys: Dict[str, tuple] = {}
+
+        # incremented by each change of the model
+        self._version = 0
+        # objnam -> the version the object was added/last changed
+        self._addedVersions: Dict[str, int] = {}
+        self._changedVersions: Dict[str, int] = {}
+        # objnam -> attribute -> the version the attribute last changed
+        self._attributeVersions: Dict[str, Dict[str, int]] = {}
+        # (version, objnam, changes, added) with changes as the params of
+        # an added object, the changed attributes or None for a removed object
+        self._changeLog: deque = deque(maxlen=changeLogSize)
+        # changesSince can answer for this version and the later ones
+        self._oldestVersion = 0
+
     @property
     def objectList(self):
         """Return the list of objects contained in the model."""
@@ -166,6 +532,11 @@ class PoolModel:
         """Return the number of objects contained in the model."""
         return len(self._objects)
 
+    @property
+    def trackedTypes(self) -> list:
+        """Return the object types kept in the model."""
+        return list(self._attributeMap.keys())
+
     def __iter__(self):
         """Allow iteration over all values."""
         return iter(self._objects.values())
@@ -181,17 +552,77 @@ class PoolModel:
             getByType('BODY') will return the object of type 'BODY'
             getByType('BODY','SPA') will only return the Spa
         """
-        return list(
-            filter(
-                lambda object: object.objtype == type
-                and (not subtype or object.subtype == subtype),
-                self,
-            )
-        )
+        key = (type, subtype) if subtype else type
+        return list(self._byType.get(key, {}).values())
 
     def getChildren(self, object: PoolObject) -> List[PoolObject]:
         """Return the children of a given object."""
-        return list(filter(lambda v: v[PARENT_ATTR] == object.objnam, self))
+        return list(self._byParent.get(object.objnam, {}).values())
+
+    def getReferencing(self, attribute: str, objnam: str) -> List[PoolObject]:
+        """Return the objects whose attribute references a given object.
+
+        attribute is one of REFERENCE_ATTRIBUTES
+        example:
+            getReferencing(BODY_ATTR, 'B1101') returns the objects (like heaters)
+            whose BODY attribute contains B1101
+        """
+        return list(self._byReference.get((attribute, objnam), {}).values())
+
+    def _index(self, object: PoolObject) -> None:
+        """Add an object to the indexes."""
+        typeKeys = (object.objtype, (object.objtype, object.subtype))
+        parent = object[PARENT_ATTR]
+        references = tuple(
+            (attribute, objnam)
+            for attribute in REFERENCE_ATTRIBUTES
+            if isinstance(object[attribute], str)
+            for objnam in object[attribute].split()
+        )
+        for key in typeKeys:
+            self._byType.setdefault(key, {})[object.objnam] = object
+        if parent:
+            self._byParent.setdefault(parent, {})[object.objnam] = object
+        for key in references:
+            self._byReference.setdefault(key, {})[object.objnam] = object
+        self._indexKeys[object.objnam] = (typeKeys, parent, references)
+
+    def _unindex(self, objnam: str) -> None:
+        """Remove an object from the indexes."""
+        keys = self._indexKeys.pop(objnam, None)
+        if not keys:
+            return
+        (typeKeys, parent, references) = keys
+        for (index, indexKeys) in (
+            (self._byType, typeKeys),
+            (self._byParent, (parent,) if parent else ()),
+            (self._byReference, references),
+        ):
+            for key in indexKeys:
+                objects = index.get(key)
+                if objects:
+                    objects.pop(objnam, None)
+                    if not objects:
+                        del index[key]
+
+    def updateObject(self, objnam: str, changes: dict) -> dict:
+        """Update an object of the model, return the changed attributes."""
+        object = self._objects.get(objnam)
+        if not object:
+            return {}
+        # the shared objnam, rather than the one decoded from a message
+        objnam = object.objnam
+        changed = object.update(changes)
+        if changed:
+            if not INDEXED_ATTRIBUTES.isdisjoint(changed):
+                self._unindex(objnam)
+                self._index(object)
+            version = self._logChange(objnam, changed)
+            self._changedVersions[objnam] = version
+            attributeVersions = self._attributeVersions.setdefault(objnam, {})
+            for key in changed:
+                attributeVersions[key] = version
+        return changed
 
     def addObject(self, objnam, params):
         """Update the model with a new object."""
@@ -200,15 +631,19 @@ class PoolModel:
         object = self._objects.get(objnam)
 
         if not object:
-            object = PoolObject(objnam, params)
+            object = createObject(objnam, params)
             if object.objtype == "SYSTEM":
                 self._systemObject = object
             if object.objtype in self._attributeMap:
-                self._objects[objnam] = object
+                self._objects[object.objnam] = object
+                self._index(object)
+                version = self._logChange(object.objnam, object.asParams(), True)
+                self._addedVersions[object.objnam] = version
+                self._changedVersions[object.objnam] = version
             else:
                 object = None
         else:
-            object.update(params)
+            self.updateObject(objnam, params)
         return object
 
     def addObjects(self, objList: list):
@@ -216,15 +651,161 @@ class PoolModel:
         for elt in objList:
             self.addObject(elt["objnam"], elt["params"])
 
+    def retainObjects(self, objnams) -> list:
+        """Remove the objects whose objnam is not in objnams, return their objnam."""
+        objnams = set(objnams)
+        removed = [objnam for objnam in self._objects if objnam not in objnams]
+        for objnam in removed:
+            del self._objects[objnam]
+            self._unindex(objnam)
+            self._forgetVersions(objnam)
+            self._logChange(objnam, None)
+        if self._systemObject and self._systemObject.objnam not in objnams:
+            self._systemObject = None
+        return removed
+
+    def clear(self) -> None:
+        """Remove all the objects from the model."""
+        self._objects.clear()
+        self._systemObject = None
+        self._byType.clear()
+        self._byParent.clear()
+        self._byReference.clear()
+        self._indexKeys.clear()
+        self._addedVersions.clear()
+        self._changedVersions.clear()
+        self._attributeVersions.clear()
+        # the changes logged so far don't lead to the new content
+        self._version += 1
+        self._changeLog.clear()
+        self._oldestVersion = self._version
+
+    @property
+    def version(self) -> int:
+        """Return the version of the model, incremented by each change."""
+        return self._version
+
+    def objectVersion(self, objnam: str) -> Optional[int]:
+        """Return the version an object was added or last changed."""
+        return self._changedVersions.get(objnam)
+
+    def attributeVersion(self, objnam: str, key: str) -> Optional[int]:
+        """Return the version an attribute of an object was set or last changed."""
+        object = self._objects.get(objnam)
+        if not object:
+            return None
+        version = self._attributeVersions.get(objnam, {}).get(key)
+        if version is None and object[key] is not None:
+            version = self._addedVersions.get(objnam)
+        return version
+
+    def changesSince(self, version: int) -> Optional[Dict[str, Optional[dict]]]:
+        """Return the changes made after a given version of the model.
+
+        The result maps objnam to the changed attributes (all the params
+        for an object added) or to None for an object removed.
+        Return None if the changes are no longer known: the caller must
+        then resync from the content of the model (see snapshot).
+        """
+        if version < self._oldestVersion or version > self._version:
+            return None
+
+        changes: Dict[str, Optional[dict]] = {}
+        # the objects whose older changes don't matter (added or removed since)
+        complete = set()
+        # the log is ordered by version, the changes to return are at the end
+        for (entryVersion, objnam, entryChanges, added) in reversed(self._changeLog):
+            if entryVersion <= version:
+                break
+            if objnam in complete:
+                continue
+            if entryChanges is None:
+                changes.setdefault(objnam, None)
+                complete.add(objnam)
+                continue
+            objectChanges = changes.setdefault(objnam, {})
+            for (key, value) in entryChanges.items():
+                # the newer values prevail
+                objectChanges.setdefault(key, value)
+            if added:
+                complete.add(objnam)
+        return changes
+
+    @property
+    def changeLogStats(self) -> dict:
+        """Return counters about the change log."""
+        return {
+            "version": self._version,
+            "oldestVersion": self._oldestVersion,
+            "size": len(self._changeLog),
+        }
+
+    def _logChange(
+        self, objnam: str, changes: Optional[dict], added: bool = False
+    ) -> int:
+        """Record a change in the log, return its version."""
+        self._version += 1
+        if len(self._changeLog) == self._changeLog.maxlen:
+            # the change about to be dropped is no longer available
+            self._oldestVersion = self._changeLog[0][0]
+        self._changeLog.append((self._version, objnam, changes, added))
+        return self._version
+
+    def _forgetVersions(self, objnam: str) -> None:
+        """Forget the versions of a removed object."""
+        self._addedVersions.pop(objnam, None)
+        self._changedVersions.pop(objnam, None)
+        self._attributeVersions.pop(objnam, None)
+
+    def snapshot(self) -> dict:
+        """Return the content of the model as a JSON serializable dictionary."""
+        return {
+            "version": SNAPSHOT_VERSION,
+            # for changesSince
+            "modelVersion": self._version,
+            "objects": [
+                {"objnam": object.objnam, "params": object.asParams()}
+                for object in self._objects.values()
+            ],
+        }
+
+    def loadSnapshot(self, snapshot: dict) -> bool:
+        """Populate the model from a snapshot, return False if it cannot be used.
+
+        an empty model resumes at the version the snapshot was taken at
+        so that changesSince answers from that version on and asks
+        to resync for the older ones
+        """
+        if not snapshot or snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+        wasEmpty = not self._objects
+        self.addObjects(snapshot["objects"])
+
+        modelVersion = snapshot.get("modelVersion")
+        if wasEmpty and isinstance(modelVersion, int) and modelVersion >= self._version:
+            self._version = modelVersion
+            self._changeLog.clear()
+            self._oldestVersion = modelVersion
+            self._attributeVersions.clear()
+            for objnam in self._objects:
+                self._addedVersions[objnam] = modelVersion
+                self._changedVersions[objnam] = modelVersion
+        return True
+
+    def trackedAttributes(self, objtype: str):
+        """Return the attributes tracked for a type of object."""
+        attributes = self._attributeMap.get(objtype)
+        if not attributes:
+            # if we don't specify a set of attributes for this object type
+            # we will default to all know attributes for this type
+            attributes = ALL_ATTRIBUTES_BY_TYPE.get(objtype, ())
+        return attributes
+
     def attributesToTrack(self):
         """Return all the object/attributes we want to track."""
         query = []
         for object in self.objectList:
-            attributes = self._attributeMap.get(object.objtype)
-            if not attributes:
-                # if we don't specify a set of attributes for this object type
-                # we will default to all know attributes for this type
-                attributes = ALL_ATTRIBUTES_BY_TYPE.get(object.objtype)
+            attributes = self.trackedAttributes(object.objtype)
             if attributes:
                 query.append({"objnam": object.objnam, "keys": list(attributes)})
         return query
@@ -234,9 +815,7 @@ class PoolModel:
         updated = {}
         for update in updates:
             objnam = update["objnam"]
-            object = self._objects.get(objnam)
-            if object:
-                changed = object.update(update["params"])
-                if changed:
-                    updated[objnam] = changed
+            changed = self.updateObject(objnam, update["params"])
+            if changed:
+                updated[objnam] = changed
         return updated
@@ -1,13 +1,276 @@
 """Protocol for communicating with a Pentair system."""
 
 import asyncio
-import json
+from collections import deque
 import logging
-from queue import SimpleQueue
+import time
+from typing import List, Optional
+
+from .codec import JSONCodec, getCodec
+from .stats import RollingStats
 
 _LOGGER = logging.getLogger(__name__)
 # _LOGGER.setLevel(logging.DEBUG)
 
+# the separator between "packets" sent by IntelliCenter
+LINE_SEPARATOR = b"\r\n"
+
+# the key used to track 'ping' requests on the wire
+PING_ID = "ping"
+
+# the commands of the requests a given response command can answer
+# other responses carry the command of their request
+RESPONSE_COMMANDS = {
+    "SendParamList": {"GetParamList", "RequestParamList"},
+    "SendQuery": {"GetQuery"},
+}
+
+# the classes of outbound requests, from the most to the least urgent
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SUBSCRIPTION = 1
+PRIORITY_QUERY = 2
+PRIORITY_MAINTENANCE = 3
+
+PRIORITY_NAMES = ["interactive", "subscription", "query", "maintenance"]
+
+# the class of a request when not given by the sender
+DEFAULT_PRIORITIES = {
+    "SETPARAMLIST": PRIORITY_INTERACTIVE,
+    "RequestParamList": PRIORITY_SUBSCRIPTION,
+    "GetParamList": PRIORITY_QUERY,
+    "GetQuery": PRIORITY_QUERY,
+}
+
+# a queued request waiting longer than that (in seconds) is sent next
+# even if more urgent requests are waiting
+DEFAULT_STARVATION_DELAY = 2.0
+
+# what to do with a new request when the outbound queue is full
+OVERFLOW_REJECT = "reject"  # fail the new request
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # drop the oldest non interactive request
+OVERFLOW_COALESCE = "coalesce"  # share an identical queued request or reject
+
+DEFAULT_MAX_QUEUE_SIZE = 100
+
+# the largest SETPARAMLIST sent, in objects and bytes
+# (the queued changes are only merged up to that size)
+MAX_CHANGES_OBJECTS = 20
+MAX_CHANGES_PAYLOAD = 4096
+
+# how many msg_ids of the requests that timed out on the wire are remembered
+# so that their late responses are not mistaken for another request's
+MAX_EXPIRED_IDS = 32
+
+# buckets (in seconds) of the round trip time histogram
+RTT_HISTOGRAM_BOUNDS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+# initial size of the receive buffer of ICBufferedProtocol
+DEFAULT_RECEIVE_BUFFER_SIZE = 64 * 1024
+
+# the largest line we are willing to buffer
+# a full GetConfiguration answer on a large system is well under that
+DEFAULT_MAX_LINE_LENGTH = 1024 * 1024
+
+# ---------------------------------------------------------------------------
+
+
+class QueueFullError(Exception):
+    """Represents a request refused or dropped because the outbound queue is full."""
+
+
+# ---------------------------------------------------------------------------
+
+
+class LineFramer:
+    """Split a stream of bytes into lines as soon as they are complete.
+
+    Only the partial tail of the stream is kept between two calls to feed.
+    The stream is split as bytes and lines are returned as bytes, they are only
+    decoded (by the JSON decoder) once all their bytes are received so a
+    multi-byte character split across two reads is never corrupted
+    (the CR/LF bytes cannot appear inside a UTF-8 sequence).
+    """
+
+    def __init__(self, maxLineLength: int = DEFAULT_MAX_LINE_LENGTH):
+        """Initialize an empty framer."""
+        self._maxLineLength = maxLineLength
+        self._buffer = bytearray()
+        # set when the current line exceeded the maximum length
+        # and is being skipped until its end
+        self._discarding = False
+        self._numDiscarded = 0
+
+    @property
+    def numDiscarded(self) -> int:
+        """Return the number of lines dropped because they were too long."""
+        return self._numDiscarded
+
+    @property
+    def pending(self) -> int:
+        """Return the number of bytes buffered for an incomplete line."""
+        return len(self._buffer)
+
+    def reset(self) -> None:
+        """Forget any partial line."""
+        self._buffer.clear()
+        self._discarding = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add data to the stream and return the lines it completed."""
+
+        buffer = self._buffer
+        # only look for a separator in the part we have not scanned yet
+        # (minus one byte in case the separator was split across reads)
+        start = max(len(buffer) - 1, 0)
+        buffer += data
+
+        lines = []
+        consumed = 0
+        while True:
+            end = buffer.find(LINE_SEPARATOR, start)
+            if end < 0:
+                break
+            if self._discarding:
+                self._discarding = False
+            elif end - consumed > self._maxLineLength:
+                # a long line received at once is dropped as well
+                self._countDiscarded()
+            elif end > consumed:
+                lines.append(bytes(buffer[consumed:end]))
+            consumed = start = end + len(LINE_SEPARATOR)
+
+        if consumed:
+            del buffer[:consumed]
+
+        # the last byte may be the start of the separator of a line
+        # of the maximum length
+        if len(buffer) > self._maxLineLength + len(LINE_SEPARATOR) - 1:
+            # no sane message is that long, drop what we have so far
+            # and skip everything until the next separator
+            if not self._discarding:
+                self._countDiscarded()
+                self._discarding = True
+            # keep the last byte in case it is the start of the separator
+            del buffer[:-1]
+
+        return lines
+
+    def _countDiscarded(self) -> None:
+        """Note that a line too long is dropped."""
+        _LOGGER.error(
+            f"PROTOCOL: discarding line longer than {self._maxLineLength} bytes"
+        )
+        self._numDiscarded += 1
+
+
+# ---------------------------------------------------------------------------
+
+
+class OutboundRequest:
+    """A request to the system, waiting in the queue or on the wire."""
+
+    def __init__(
+        self,
+        msg_id: str,
+        command: str,
+        extra: dict = None,
+        packet: str = None,
+        priority: int = None,
+    ):
+        """Initialize from a command and its parameters (or a raw packet)."""
+        self.msg_id = msg_id
+        self.command = command
+        self.extra = extra
+        # the request as written on the wire, built on demand
+        self._packet = packet.encode() if packet is not None else None
+        self.priority = (
+            DEFAULT_PRIORITIES.get(command, PRIORITY_MAINTENANCE)
+            if priority is None
+            else priority
+        )
+        # the msg_ids of the requests that were merged into this one
+        self.mergedIds = []
+        # (msg_id, objectList) of each SETPARAMLIST merged, this one first
+        # so that the changes can be rebuilt if one of them is withdrawn
+        self._parts = []
+        self.queuedAt = time.monotonic()
+        self.sentAt = None
+
+    def encode(self, codec: JSONCodec) -> bytes:
+        """Return the request as written on the wire."""
+        if self._packet is None:
+            dict = {"messageID": self.msg_id, "command": self.command}
+            if self.extra:
+                dict.update(self.extra)
+            self._packet = codec.dumps(dict)
+        return self._packet
+
+    @property
+    def isCoalescable(self) -> bool:
+        """Return True if other changes can be merged into this request."""
+        return (
+            self.command == "SETPARAMLIST"
+            and self.extra is not None
+            and set(self.extra.keys()) == {"objectList"}
+        )
+
+    def canMerge(self, other: "OutboundRequest", codec: JSONCodec) -> bool:
+        """Return True if the changes of other fit in this request."""
+        if not (self.isCoalescable and other.isCoalescable):
+            return False
+        objnams = {item["objnam"] for item in self.extra["objectList"]}
+        objnams.update(item["objnam"] for item in other.extra["objectList"])
+        # the merged request can only be smaller than both together
+        return (
+            len(objnams) <= MAX_CHANGES_OBJECTS
+            and len(self.encode(codec)) + len(other.encode(codec))
+            <= MAX_CHANGES_PAYLOAD
+        )
+
+    def merge(self, other: "OutboundRequest") -> None:
+        """Merge the changes of another SETPARAMLIST into this one.
+
+        changes to the same object are combined, the latest value winning
+        changes to other objects are added to the objectList
+        """
+        if not self._parts:
+            self._parts = [(self.msg_id, self.extra["objectList"])]
+        self._parts.extend(other._parts or [(other.msg_id, other.extra["objectList"])])
+        self.mergedIds.append(other.msg_id)
+        self.mergedIds.extend(other.mergedIds)
+        self._rebuild()
+
+    def withdraw(self, msg_id: str) -> None:
+        """Remove a request merged into this one (or this one if others remain)."""
+        if msg_id == self.msg_id:
+            self.msg_id = self.mergedIds.pop(0)
+        else:
+            self.mergedIds.remove(msg_id)
+        if self._parts:
+            self._parts = [part for part in self._parts if part[0] != msg_id]
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Combine the changes of the merged requests, in the order received."""
+        # don't modify the objects given by the senders
+        objectList = []
+        objects = {}
+        for (_, items) in self._parts:
+            for item in items:
+                existing = objects.get(item["objnam"])
+                if existing:
+                    existing["params"].update(item["params"])
+                else:
+                    existing = {
+                        "objnam": item["objnam"],
+                        "params": dict(item["params"]),
+                    }
+                    objectList.append(existing)
+                    objects[item["objnam"]] = existing
+        self.extra = {"objectList": objectList}
+        self._packet = None
+
+
 # ---------------------------------------------------------------------------
 
 
@@ -19,127 +282,631 @@ class ICProtocol(asyncio.Protocol):
     - receiving data from the transport and combining it into a proper json object
     - managing a 'only-one-request-out-one-the-wire' policy
     this is more a "works better that way" thand a real requirement as far as know
-    - sending regular (every 10s) 'ping' requests and closing the connection if 'pong'
-    replies are not received fast enough (we allow 2 outstanding which is generous)
+    a larger window can be allowed with maxWindow, the number of requests on the
+    wire then adapts to the response latency and to errors
+    - sending a 'ping' request when nothing was received for a while (10s)
+    and closing the connection if 'pong' replies are not received fast enough
+    (we allow 2 outstanding which is generous)
+    the round trip time of these pings is measured
+    - merging the SETPARAMLIST requests waiting in the queue into a single one
+    - sending the most urgent queued request first (interactive changes before
+    subscriptions, queries and maintenance) without starving the others
+    - holding the queued requests while the transport is paused (backpressure)
+    and bounding the queue with an overflow policy
     """
 
-    def __init__(self, controller):
+    def __init__(
+        self,
+        controller,
+        maxLineLength: int = DEFAULT_MAX_LINE_LENGTH,
+        maxWindow: int = 1,
+        heartbeatInterval: float = 10,
+        maxMissedPongs: int = 2,
+        starvationDelay: float = DEFAULT_STARVATION_DELAY,
+        codec: JSONCodec = None,
+        maxQueueSize: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflowPolicy: str = OVERFLOW_DROP_OLDEST,
+        writeBufferLimit: int = None,
+    ):
         """Initialize a protocol for a IntelliCenter system."""
 
         self._controller = controller
 
+        # encodes the requests and decodes the messages received
+        self._codec = codec or getCodec()
+
         self._transport = None
 
         # counter used to generate messageIDs
         self._msgID = 1
 
-        # buffer used to accumulate data received before splitting into lines
-        self._lineBuffer = ""
+        # splits the data received into lines
+        self._framer = self._createFramer(maxLineLength)
 
-        # state variable and queue for flow control
+        # state variable and queues (one per priority) for flow control
         # see sendRequest and responseReceived for details
         self._out_pending = 0
-        self._out_queue = SimpleQueue()
+        self._out_queues = [deque() for _ in PRIORITY_NAMES]
+        self._starvationDelay = starvationDelay
+
+        # per priority: number of requests sent and time spent in the queue
+        self._queueStats = [
+            {"sent": 0, "totalWait": 0.0, "maxWait": 0.0} for _ in PRIORITY_NAMES
+        ]
+
+        # the queues are bounded, see _makeRoomInQueue
+        self._maxQueueSize = maxQueueSize
+        self._overflowPolicy = overflowPolicy
+        self._numRejected = 0
+        self._numDropped = 0
+
+        # backpressure from the transport, see pause_writing/resume_writing
+        self._writeBufferLimit = writeBufferLimit
+        self._writingPaused = False
+        self._numPauses = 0
+        self._writeBufferHighWater = 0
+
+        # the congestion window: how many requests we allow on the wire
+        # it grows slowly while responses come back at a steady pace
+        # and is halved on errors or timeouts (AIMD)
+        self._maxWindow = max(1, maxWindow)
+        self._window = 1.0
+
+        # the requests on the wire (oldest first)
+        self._onWire = deque()
+
+        # the msg_ids of the requests that timed out while on the wire
+        self._expired = deque(maxlen=MAX_EXPIRED_IDS)
+
+        # number of requests merged into another one while queued
+        self._numMerged = 0
+
+        # bytes exchanged over this connection
+        self._bytesSent = 0
+        self._bytesReceived = 0
+
+        # number of responses matched to their request by order
+        # rather than by messageID
+        self._numCorrelated = 0
+
+        # statistics on the responses received
+        self._latency = RollingStats()
+        self._windowStats = {}
+        self._windowSince = time.monotonic()
 
         # and the number of unacknowledgged ping issued
         self._num_unacked_pings = 0
 
+        # heartbeat: a 'ping' is sent if nothing was received for that long
+        self._heartbeatInterval = heartbeatInterval
+        self._maxMissedPongs = maxMissedPongs
+        self._heartbeatHandle = None
+        self._lastReceived = time.monotonic()
+
+        # time each unacknowledged ping was sent and the measured round trips
+        self._pingTimes = deque()
+        self._rtt = RollingStats()
+
     def connection_made(self, transport):
         """Handle the callback for a successful connection."""
 
         self._transport = transport
         self._msgID = 1
+        self._resetReceive()
+        self._expired.clear()
+
+        if self._writeBufferLimit:
+            transport.set_write_buffer_limits(high=self._writeBufferLimit)
+
+        self._lastReceived = time.monotonic()
+        self._scheduleHeartbeat()
 
         # and notify our controller that we are ready!
         self._controller.connection_made(self, transport)
 
+    def _createFramer(self, maxLineLength: int) -> Optional[LineFramer]:
+        """Return the framer splitting the data received into lines."""
+        return LineFramer(maxLineLength)
+
+    def _resetReceive(self) -> None:
+        """Forget any partial line received."""
+        self._framer.reset()
+
+    @property
+    def numDiscarded(self) -> int:
+        """Return the number of lines dropped because they were too long."""
+        return self._framer.numDiscarded
+
     def connection_lost(self, exc):
         """Handle the callback for connection lost."""
 
+        if self._heartbeatHandle:
+            self._heartbeatHandle.cancel()
+            self._heartbeatHandle = None
+
         self._controller.connection_lost(exc)
 
+    def pause_writing(self) -> None:
+        """Handle the transport buffer going over its high-water mark."""
+        _LOGGER.debug("PROTOCOL: transport paused writing")
+        self._writingPaused = True
+        self._numPauses += 1
+        self._noteWriteBufferSize()
+
+    def resume_writing(self) -> None:
+        """Handle the transport buffer draining below its low-water mark."""
+        _LOGGER.debug("PROTOCOL: transport resumed writing")
+        self._writingPaused = False
+        self._sendQueued()
+
+    def _noteWriteBufferSize(self) -> None:
+        if self._transport:
+            self._writeBufferHighWater = max(
+                self._writeBufferHighWater, self._transport.get_write_buffer_size()
+            )
+
     def data_received(self, data) -> None:
         """Handle the callback for data received."""
 
-        data = data.decode()
         _LOGGER.debug(f"PROTOCOL: received from transport: {data}")
 
+        self._lastReceived = time.monotonic()
+        self._bytesReceived += len(data)
+
         # "packets" from Pentair are organized by lines
-        # so wait until at least a full line is received
-        self._lineBuffer += data
+        # each complete line is processed as soon as it is received
+        # and only a partial line, if any, is kept for the next read
+        for line in self._framer.feed(data):
+            self.processMessage(line)
+
+    def _scheduleHeartbeat(self) -> None:
+        if self._heartbeatInterval:
+            self._heartbeatHandle = asyncio.get_event_loop().call_later(
+                self._heartbeatInterval, self._heartbeat
+            )
+
+    def _heartbeat(self) -> None:
+        """Check the connection is alive, ping the system if it has been idle."""
 
-        if not self._lineBuffer.endswith("\r\n"):
+        self._heartbeatHandle = None
+
+        if not self._transport:
+            return
+
+        if self._num_unacked_pings >= self._maxMissedPongs:
+            # the system is not answering anymore
+            # closing the transport will trigger connection_lost(None)
+            _LOGGER.error(
+                f"PROTOCOL: {self._num_unacked_pings} ping(s) unanswered, closing"
+            )
+            self._transport.close()
             return
 
-        # there might have been more than one "packet" in our current buffer
-        # so let's split them
+        # no need to ping a system that just sent us something
+        if time.monotonic() - self._lastReceived >= self._heartbeatInterval:
+            try:
+                # the time it is sent is recorded once written, not queued
+                self.sendRequest(OutboundRequest(PING_ID, "ping", packet="ping"))
+                self._num_unacked_pings += 1
+            except QueueFullError:
+                # so many requests are waiting that a ping would not help
+                pass
 
-        lines = str.split(self._lineBuffer, "\r\n")
-        self._lineBuffer = ""
+        self._scheduleHeartbeat()
 
-        for line in lines:
-            if line:
-                # and process each line individually
-                self.processMessage(line)
+    @property
+    def rttStats(self) -> dict:
+        """Return statistics on the round trip time of ping requests."""
+        result = self._rtt.asDict()
+        result["histogram"] = self._rtt.histogram(RTT_HISTOGRAM_BOUNDS)
+        result["unacknowledged"] = self._num_unacked_pings
+        return result
 
-    def sendCmd(self, cmd: str, extra: dict = None) -> str:
-        """Send a command and return a generated msg id."""
+    def sendCmd(self, cmd: str, extra: dict = None, priority: int = None) -> str:
+        """Send a command and return a generated msg id.
+
+        priority is one of the PRIORITY_ classes, by default based on the command
+        """
         msg_id = str(self._msgID)
-        dict = {"messageID": msg_id, "command": cmd}
-        if extra:
-            dict.update(extra)
         self._msgID = self._msgID + 1
-        packet = json.dumps(dict)
-        self.sendRequest(packet)
+        self.sendRequest(OutboundRequest(msg_id, cmd, extra, priority=priority))
+
+        return msg_id
 
-        return str(msg_id)
+    @property
+    def bytesReceived(self) -> int:
+        """Return the number of bytes received on this connection."""
+        return self._bytesReceived
 
-    def _writeToTransport(self, request):
-        _LOGGER.debug(
-            f"PROTOCOL: writing to transport: (size {len(request)}): {request}"
+    @property
+    def bytesSent(self) -> int:
+        """Return the number of bytes sent on this connection."""
+        return self._bytesSent
+
+    @property
+    def window(self) -> int:
+        """Return the number of requests currently allowed on the wire."""
+        return int(self._window)
+
+    @property
+    def stats(self) -> dict:
+        """Return statistics about the flow control."""
+        self._accountWindowTime()
+        windows = {}
+        for (size, values) in sorted(self._windowStats.items()):
+            windows[size] = {
+                "responses": values["responses"],
+                "errors": values["errors"],
+                "meanLatency": values["latency"] / values["responses"]
+                if values["responses"]
+                else None,
+                "throughput": values["responses"] / values["time"]
+                if values["time"]
+                else None,
+            }
+        return {
+            "window": self.window,
+            "maxWindow": self._maxWindow,
+            "inFlight": self._out_pending,
+            "queued": self.queueStats,
+            "merged": self._numMerged,
+            "rejected": self._numRejected,
+            "dropped": self._numDropped,
+            "writingPaused": self._writingPaused,
+            "pauses": self._numPauses,
+            "writeBufferSize": self._transport.get_write_buffer_size()
+            if self._transport
+            else 0,
+            "writeBufferHighWater": self._writeBufferHighWater,
+            "bytesSent": self._bytesSent,
+            "bytesReceived": self._bytesReceived,
+            "correlated": self._numCorrelated,
+            "discarded": self.numDiscarded,
+            "latency": self._latency.asDict(),
+            "windows": windows,
+        }
+
+    @property
+    def queueStats(self) -> dict:
+        """Return the depth and wait time of the outbound queue per priority."""
+        now = time.monotonic()
+        result = {}
+        for (priority, name) in enumerate(PRIORITY_NAMES):
+            queue = self._out_queues[priority]
+            stats = self._queueStats[priority]
+            result[name] = {
+                "depth": len(queue),
+                "oldestWait": now - queue[0].queuedAt if queue else 0.0,
+                "sent": stats["sent"],
+                "meanWait": stats["totalWait"] / stats["sent"]
+                if stats["sent"]
+                else None,
+                "maxWait": stats["maxWait"],
+            }
+        return result
+
+    def _currentWindowStats(self) -> dict:
+        return self._windowStats.setdefault(
+            self.window, {"responses": 0, "errors": 0, "latency": 0.0, "time": 0.0}
+        )
+
+    def _accountWindowTime(self) -> None:
+        """Charge the time elapsed to the current window size."""
+        now = time.monotonic()
+        self._currentWindowStats()["time"] += now - self._windowSince
+        self._windowSince = now
+
+    def _resizeWindow(self, newWindow: float) -> None:
+        newWindow = min(max(newWindow, 1.0), float(self._maxWindow))
+        if int(newWindow) != self.window:
+            self._accountWindowTime()
+            _LOGGER.debug(f"PROTOCOL: window now {int(newWindow)}")
+        self._window = newWindow
+
+    def _writeToTransport(self, request: OutboundRequest):
+        packet = request.encode(self._codec)
+        _LOGGER.debug(f"PROTOCOL: writing to transport: (size {len(packet)}): {packet}")
+        request.sentAt = time.monotonic()
+        if request.msg_id == PING_ID:
+            self._pingTimes.append(request.sentAt)
+        self._onWire.append(request)
+        self._out_pending += 1
+        self._bytesSent += len(packet)
+        self._transport.write(packet)
+        self._noteWriteBufferSize()
+
+    def _nextQueued(self) -> Optional[OutboundRequest]:
+        """Remove and return the next queued request to send (if any)."""
+
+        now = time.monotonic()
+
+        # a request that waited too long goes first, the oldest of them
+        # so that bulk requests are not delayed forever by a busy user
+        starved = [
+            queue
+            for queue in self._out_queues
+            if queue and now - queue[0].queuedAt >= self._starvationDelay
+        ]
+        if starved:
+            queue = min(starved, key=lambda queue: queue[0].queuedAt)
+        else:
+            queue = next((queue for queue in self._out_queues if queue), None)
+        if not queue:
+            return None
+
+        request = queue.popleft()
+
+        wait = now - request.queuedAt
+        stats = self._queueStats[request.priority]
+        stats["sent"] += 1
+        stats["totalWait"] += wait
+        stats["maxWait"] = max(stats["maxWait"], wait)
+
+        return request
+
+    def _sendQueued(self) -> None:
+        """Write queued requests to the wire while the window allows it."""
+        while self._out_pending < self.window and not self._writingPaused:
+            request = self._nextQueued()
+            if not request:
+                break
+            self._writeToTransport(request)
+            if request.msg_id != PING_ID:
+                for msg_id in [request.msg_id] + request.mergedIds:
+                    self._controller.requestSent(msg_id)
+
+    def _coalesce(self, request: OutboundRequest) -> bool:
+        """Merge a request into a compatible queued one, return True if merged."""
+        if not request.isCoalescable:
+            return False
+        # only the last queued change can take the new one
+        # otherwise the new values could be overwritten by older ones
+        queued = next(
+            (
+                queued
+                for queued in reversed(self._out_queues[request.priority])
+                if queued.command == request.command
+            ),
+            None,
         )
-        self._transport.write(request.encode())
+        if not queued or not queued.canMerge(request, self._codec):
+            return False
+        queued.merge(request)
+        self._numMerged += 1
+        _LOGGER.debug(f"PROTOCOL: request {request.msg_id} merged into {queued.msg_id}")
+        return True
+
+    @property
+    def queueSize(self) -> int:
+        """Return the number of requests waiting in the outbound queues."""
+        return sum(len(queue) for queue in self._out_queues)
+
+    def _dropOldest(self) -> bool:
+        """Drop the oldest non interactive queued request, return True if any."""
+        queues = [
+            queue for queue in self._out_queues[PRIORITY_INTERACTIVE + 1 :] if queue
+        ]
+        if not queues:
+            return False
+        request = min(queues, key=lambda queue: queue[0].queuedAt).popleft()
+        self._numDropped += 1
+        _LOGGER.warning(f"PROTOCOL: queue full, dropping request {request.msg_id}")
+        if request.msg_id == PING_ID:
+            # no pong will come for that one
+            self._num_unacked_pings -= 1
+        error = QueueFullError(f"request {request.msg_id} dropped, queue full")
+        for msg_id in [request.msg_id] + request.mergedIds:
+            if msg_id != PING_ID:
+                self._controller.requestDropped(msg_id, error)
+        return True
 
-    def sendRequest(self, request: str) -> None:
-        """Either send the request to the wire or queue it for later."""
+    def _shareIdentical(self, request: OutboundRequest) -> bool:
+        """Let a request share the response of an identical queued one."""
+        if request.msg_id == PING_ID:
+            # each ping expects its own pong
+            return False
+        for queued in self._out_queues[request.priority]:
+            if queued.command == request.command and queued.extra == request.extra:
+                queued.mergedIds.append(request.msg_id)
+                self._numMerged += 1
+                return True
+        return False
+
+    def _withdrawQueued(self, msg_id: str) -> bool:
+        """Remove a request from the queues, return True if it was queued."""
+        for queue in self._out_queues:
+            for request in queue:
+                if request.msg_id != msg_id and msg_id not in request.mergedIds:
+                    continue
+                if request.mergedIds:
+                    # the other requests merged still have to be sent
+                    request.withdraw(msg_id)
+                else:
+                    queue.remove(request)
+                _LOGGER.debug(f"PROTOCOL: request {msg_id} withdrawn from the queue")
+                return True
+        return False
+
+    def _enqueue(self, request: OutboundRequest) -> None:
+        """Queue a request, applying the overflow policy if the queue is full."""
+
+        # the changes a request carries could join one already waiting
+        # (like the intermediate values of a slider) so that the system
+        # does not replay every stale value
+        if self._coalesce(request):
+            return
+
+        if self._maxQueueSize and self.queueSize >= self._maxQueueSize:
+            if self._overflowPolicy == OVERFLOW_DROP_OLDEST and self._dropOldest():
+                pass
+            elif self._overflowPolicy == OVERFLOW_COALESCE and self._shareIdentical(
+                request
+            ):
+                return
+            else:
+                self._numRejected += 1
+                raise QueueFullError(
+                    f"{self.queueSize} requests already waiting to be sent"
+                )
+
+        self._out_queues[request.priority].append(request)
+
+    def sendRequest(self, request: OutboundRequest) -> None:
+        """Either send the request to the wire or queue it for later.
+
+        raise QueueFullError if the request can't be queued
+        """
 
         # IntelliCenter seems to struggle to parse requests coming too fast
-        # so we throttle back to one request on the wire at a time
+        # so we throttle back to a limited number of requests on the wire
+        # (by default only one at a time)
         # see responseReceived() for the other side of the flow control
+        # we also hold the requests while the transport can't keep up
 
-        if self._out_pending == 0:
-            # nothing is progress, we can transmit the packet
+        if (
+            self._out_pending < self.window
+            and not self._writingPaused
+            and not any(self._out_queues)
+        ):
+            # there is room on the wire, we can transmit the packet
             self._writeToTransport(request)
         else:
-            # there is already something on the wire, let's queue the request
-            self._out_queue.put(request)
+            # the wire is full, let's queue the request
+            self._enqueue(request)
 
-        # and count the new request as pending
-        self._out_pending += 1
+    def _popOnWire(self, msg_id: str) -> Optional[OutboundRequest]:
+        """Return the request on the wire with that msg_id and forget it."""
+        for (index, request) in enumerate(self._onWire):
+            if request.msg_id == msg_id:
+                del self._onWire[index]
+                return request
+        return None
 
-    def responseReceived(self) -> None:
-        """Handle the flow control part of a received rsponse."""
+    def _correlate(self, msg_id: str, command: str) -> Optional[str]:
+        """Return the msg_id of the request an error response is answering.
 
-        # we know that a response has been received
-        # so, if we have a pending request in the queue
-        # we can write it to our transport
-        if not self._out_queue.empty():
-            request = self._out_queue.get()
-            self._writeToTransport(request)
-        # no matter what, we have now one less request pending
-        if self._out_pending:
+        IntelliCenter sometimes answers an error with a messageID that does not
+        match the request. Since the requests on the wire are answered in order
+        such a response is matched with the oldest request of a compatible
+        command, or simply the oldest request if the command is not telling.
+        return None if no request on the wire can be the one answered.
+        """
+
+        if any(request.msg_id == msg_id for request in self._onWire):
+            return msg_id
+
+        # the late answer of a request that timed out is for no other request
+        if msg_id in self._expired:
+            return msg_id
+
+        candidates = [
+            (request.msg_id, request.command.lower())
+            for request in self._onWire
+            if request.msg_id != PING_ID
+        ]
+
+        compatible = {
+            name.lower() for name in RESPONSE_COMMANDS.get(command, {command})
+        }
+        matches = [wire_id for (wire_id, name) in candidates if name in compatible]
+
+        # a command that is not one we could have sent (like an 'Error')
+        # says nothing about the request so the oldest one is the best guess
+        if not matches and command not in RESPONSE_COMMANDS:
+            matches = [wire_id for (wire_id, _) in candidates]
+
+        if not matches:
+            return None
+
+        wire_id = matches[0]
+        _LOGGER.debug(f"PROTOCOL: response {msg_id} ({command}) matched to {wire_id}")
+        self._numCorrelated += 1
+        return wire_id
+
+    def responseReceived(
+        self, success: bool = True, msg_id: str = None
+    ) -> Optional[OutboundRequest]:
+        """Handle the flow control part of a received response.
+
+        return the request this response is for (if known)
+        """
+
+        # the late response of a request that timed out: its slot was
+        # already released, releasing another one would overrun the window
+        if msg_id in self._expired:
+            self._expired.remove(msg_id)
+            _LOGGER.debug(f"PROTOCOL: late response for expired request {msg_id}")
+            return None
+
+        # since the messageID of a response does not always match its request
+        # consider it is the response to the oldest request if we can't find it
+        request = self._popOnWire(msg_id)
+        if request is None and self._onWire:
+            self._onWire.popleft()
             self._out_pending -= 1
+        elif request:
+            # we know that a response has been received
+            # so we have now one less request pending
+            self._out_pending -= 1
+
+        windowStats = self._currentWindowStats()
+        windowStats["responses"] += 1
+
+        if request:
+            latency = time.monotonic() - request.sentAt
+            windowStats["latency"] += latency
+            # only grow the window if the latency is not drifting away
+            # from what we usually observe: that would mean the panel is
+            # already struggling with the requests we send
+            baseline = self._latency.min
+            self._latency.add(latency)
+            if success and (baseline is None or latency <= 2 * baseline + 0.05):
+                self._resizeWindow(self._window + 1 / self._window)
+
+        if not success:
+            windowStats["errors"] += 1
+            self._resizeWindow(self._window / 2)
+
+        # and if we have pending requests in the queue
+        # we can write them to our transport
+        self._sendQueued()
+
+        return request
+
+    def requestTimedOut(self, msg_id: str) -> None:
+        """Handle a request for which no response will be received."""
+
+        # a request still queued must not be sent anymore
+        if self._withdrawQueued(msg_id):
+            return
+
+        # if the request made it to the wire, its slot has to be released
+        # otherwise the flow control would wait forever for its response
+        if self._popOnWire(msg_id) is None:
+            return
 
-    def processMessage(self, message: str) -> None:
-        """Process a given message from IntelliCenter."""
+        self._out_pending -= 1
+        self._expired.append(msg_id)
+
+        self._currentWindowStats()["errors"] += 1
+        self._resizeWindow(self._window / 2)
+
+        self._sendQueued()
+
+    def processMessage(self, message) -> None:
+        """Process a given message (str or UTF-8 bytes) from IntelliCenter."""
 
         _LOGGER.debug(f"PROTOCOL: processMessage {message}")
 
         # if message is 'pong', response for a previous 'ping'
         # do nothing except noting a response was received
-        if message == "pong":
-            self.responseReceived()
-            self._num_unacked_pings -= 1
+        # (the message can be bytes, see ICBufferedProtocol)
+        if message == "pong" or message == b"pong":
+            self.responseReceived(msg_id=PING_ID)
+            if self._num_unacked_pings:
+                self._num_unacked_pings -= 1
+            if self._pingTimes:
+                self._rtt.add(time.monotonic() - self._pingTimes.popleft())
             _LOGGER.debug("ping acknowledged")
             return
 
@@ -149,25 +916,161 @@ class ICProtocol(asyncio.Protocol):
         try:
             # the message is excepted to be a JSON object
 
-            msg = json.loads(message)
+            msg = self._codec.loads(message)
 
             # with a minimum of a messageID and a command
             # NOTE: there seems to be a bug in IntelliCenter where
             # the message_id is different from the one matching the request
-            # if an error occurred.. therefore the message_id is not really used
+            # if an error occurred.. so we match these by order instead
 
             msg_id = msg["messageID"]
             command = msg["command"]
             response = msg.get("response")
 
+            # an error that can't be matched to a request on the wire
+            # leaves the flow control alone: releasing a slot would leave
+            # its request waiting for a response already consumed
+            matched = msg_id
+            if response and response != "200":
+                matched = self._correlate(msg_id, command)
+                if matched is not None:
+                    msg_id = matched
+
             # the response field is only present when the message is a response to
             # a request (as opposed to a 'notification')
             # if so, we also not that a response was received
-            if response:
-                self.responseReceived()
+            request = None
+            if response and matched is not None:
+                request = self.responseReceived(response == "200", msg_id)
 
             # let's pass our message back to the controller for handling its semantic...
             self._controller.receivedMessage(msg_id, command, response, msg)
 
+            # the requests merged into another one share its response
+            if request:
+                for merged_id in request.mergedIds:
+                    self._controller.receivedMessage(merged_id, command, response, msg)
+
         except Exception as err:
             _LOGGER.error(f"PROTOCOL: exception while receiving message {err}")
+
+
+# ---------------------------------------------------------------------------
+
+
+class ICBufferedProtocol(ICProtocol, asyncio.BufferedProtocol):
+    """A ICProtocol receiving data directly into a preallocated buffer.
+
+    The transport writes into a reusable buffer, lines are found in place
+    and handed as bytes to the JSON decoder, avoiding the decoding and
+    concatenation of every chunk received.
+    The buffer grows (up to the maximum line length and its separator)
+    only if a single line does not fit in it.
+    """
+
+    def __init__(
+        self,
+        controller,
+        bufferSize: int = DEFAULT_RECEIVE_BUFFER_SIZE,
+        maxLineLength: int = DEFAULT_MAX_LINE_LENGTH,
+        **kwargs,
+    ):
+        """Initialize a protocol for a IntelliCenter system."""
+        super().__init__(controller, maxLineLength=maxLineLength, **kwargs)
+
+        # a line of the maximum length must fit along with its separator
+        self._maxBufferSize = maxLineLength + len(LINE_SEPARATOR)
+        self._buffer = bytearray(min(bufferSize, self._maxBufferSize))
+        self._view = memoryview(self._buffer)
+
+        # the unprocessed data is buffer[_start:_end]
+        # and buffer[_start:_scanned] is known not to contain a separator
+        self._start = 0
+        self._end = 0
+        self._scanned = 0
+
+        # set when the current line exceeded the maximum length
+        # and is being skipped until its end
+        self._discarding = False
+        self._numDiscarded = 0
+
+    def _createFramer(self, maxLineLength: int) -> Optional[LineFramer]:
+        """Return None, the lines are found in the receive buffer itself."""
+        return None
+
+    def _resetReceive(self) -> None:
+        """Forget any partial line received."""
+        self._start = self._end = self._scanned = 0
+        self._discarding = False
+
+    @property
+    def numDiscarded(self) -> int:
+        """Return the number of lines dropped because they were too long."""
+        return self._numDiscarded
+
+    def _makeRoom(self) -> None:
+        """Make room at the end of the buffer for more data."""
+
+        size = self._end - self._start
+
+        if self._start:
+            # move the partial line at the beginning of the buffer
+            self._view[:size] = self._view[self._start : self._end]
+            self._scanned -= self._start
+            self._start, self._end = 0, size
+        elif size < self._maxBufferSize:
+            # a single line larger than the buffer
+            newBuffer = bytearray(min(2 * len(self._buffer), self._maxBufferSize))
+            newBuffer[:size] = self._view[:size]
+            self._view.release()
+            self._buffer = newBuffer
+            self._view = memoryview(self._buffer)
+        else:
+            # no sane message is that long, drop what we have so far
+            # and skip everything until the next separator
+            if not self._discarding:
+                _LOGGER.error(
+                    "PROTOCOL: discarding line longer than"
+                    f" {self._maxBufferSize - len(LINE_SEPARATOR)} bytes"
+                )
+                self._numDiscarded += 1
+                self._discarding = True
+            # keep the last byte in case it is the start of the separator
+            self._view[0] = self._view[self._end - 1]
+            self._start, self._end, self._scanned = 0, 1, 0
+
+    def get_buffer(self, sizehint: int):
+        """Return the part of the buffer available for the next read."""
+        if self._end == len(self._buffer):
+            self._makeRoom()
+        return self._view[self._end :]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        """Handle the callback for data written into our buffer."""
+
+        self._lastReceived = time.monotonic()
+        self._bytesReceived += nbytes
+
+        buffer = self._buffer
+        self._end += nbytes
+        end = self._end
+        start = self._start
+        # the separator may have been split across reads
+        pos = max(self._scanned - 1, start)
+
+        while True:
+            index = buffer.find(LINE_SEPARATOR, pos, end)
+            if index < 0:
+                break
+            if self._discarding:
+                self._discarding = False
+            elif index > start:
+                self.processMessage(bytes(self._view[start:index]))
+            start = pos = index + len(LINE_SEPARATOR)
+
+        if start == end:
+            # everything was processed, start from the beginning again
+            self._start = self._end = self._scanned = 0
+        else:
+            self._start = start
+            self._scanned = end
@@ -0,0 +1,150 @@
+"""Registry of the requests waiting for a response from a Pentair system."""
+
+import asyncio
+from asyncio import Future
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from .timers import TimerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+
+
+class PendingRequest:
+    """A request sent to the system and waiting for its response."""
+
+    def __init__(
+        self, msg_id: str, command: str, future: Optional[Future], timeout: float
+    ):
+        """Initialize."""
+        self.msg_id = msg_id
+        self.command = command
+        # None if the sender did not care about the response
+        self.future = future
+        self.timeout = timeout
+        self.sentAt = time.monotonic()
+
+
+class RequestRegistry:
+    """Keep track of the requests waiting for a response.
+
+    Every request gets a deadline, including the ones nobody waits for,
+    so that entries never outlive a response that is never coming.
+    The deadline restarts when a request queued by the protocol is actually sent.
+    When a deadline is reached, the waiter receives an asyncio.TimeoutError
+    and onTimeout(msg_id) is invoked.
+    """
+
+    def __init__(
+        self,
+        timers: TimerWheel,
+        onTimeout: Callable[[str], None] = None,
+    ):
+        """Initialize an empty registry."""
+        self._timers = timers
+        self._onTimeout = onTimeout
+
+        # in the order the requests were sent
+        self._requests: Dict[str, PendingRequest] = {}
+
+        self._numCompleted = 0
+        self._numTimedOut = 0
+        self._numOrphaned = 0
+
+    def __len__(self):
+        """Return the number of requests waiting for a response."""
+        return len(self._requests)
+
+    def __contains__(self, msg_id):
+        """Return True if a request with that msg_id is waiting."""
+        return msg_id in self._requests
+
+    def add(
+        self, msg_id: str, command: str, future: Optional[Future], timeout: float
+    ) -> PendingRequest:
+        """Register a request and its deadline."""
+        request = PendingRequest(msg_id, command, future, timeout)
+        self._requests[msg_id] = request
+        self._timers.schedule(("request", msg_id), timeout, self._timedOut)
+        return request
+
+    def sent(self, msg_id: str) -> None:
+        """Restart the deadline of a request that was queued and is now sent."""
+        request = self._requests.get(msg_id)
+        if request:
+            request.sentAt = time.monotonic()
+            self._timers.schedule(("request", msg_id), request.timeout, self._timedOut)
+
+    def pop(self, msg_id: str) -> Optional[PendingRequest]:
+        """Return and forget the request matching a response (if any)."""
+        request = self._requests.pop(msg_id, None)
+        if request:
+            self._timers.cancel(("request", msg_id))
+            self._numCompleted += 1
+        return request
+
+    def fail(self, msg_id: str, exc: Exception) -> None:
+        """Forget a request that will never be sent and notify its waiter."""
+        request = self._requests.pop(msg_id, None)
+        if request:
+            self._timers.cancel(("request", msg_id))
+            if request.future and not request.future.done():
+                request.future.set_exception(exc)
+
+    def orphaned(self, msg_id: str) -> None:
+        """Note that a response did not match any pending request."""
+        self._numOrphaned += 1
+
+    def cancelAll(self) -> None:
+        """Cancel all waiters and forget all requests."""
+        for request in self._requests.values():
+            self._timers.cancel(("request", request.msg_id))
+            if request.future and not request.future.done():
+                request.future.cancel()
+        self._requests.clear()
+
+    def _timedOut(self, key) -> None:
+        msg_id = key[1]
+        request = self._requests.pop(msg_id, None)
+        if not request:
+            return
+        self._numTimedOut += 1
+        _LOGGER.warning(f"REGISTRY: request {msg_id} ({request.command}) timed out")
+        if request.future and not request.future.done():
+            request.future.set_exception(asyncio.TimeoutError())
+        if self._onTimeout:
+            self._onTimeout(msg_id)
+
+    @property
+    def stats(self) -> dict:
+        """Return counters about the requests."""
+        return {
+            "pending": len(self._requests),
+            "completed": self._numCompleted,
+            "timedOut": self._numTimedOut,
+            "orphaned": self._numOrphaned,
+        }
+
+
+# ---------------------------------------------------------------------------
+
+
+class StateWatch:
+    """A waiter for attributes of an object to reach given values."""
+
+    def __init__(self, objnam: str, expected: dict, future: Future):
+        """Initialize."""
+        self.objnam = objnam
+        # the attributes (and their values) not reported by the system yet
+        self.remaining = dict(expected)
+        self.future = future
+
+    def matches(self, params: dict) -> bool:
+        """Account for values reported by the system, return True once all reached."""
+        for (key, value) in params.items():
+            if key in self.remaining and self.remaining[key] == value:
+                del self.remaining[key]
+        return not self.remaining
@@ -0,0 +1,88 @@
+"""Small helpers to collect statistics about the protocol."""
+
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional
+
+# ---------------------------------------------------------------------------
+
+
+class RollingStats:
+    """Keep the last N samples of a measurement (like a latency)."""
+
+    def __init__(self, size: int = 100):
+        """Initialize with the number of samples to remember."""
+        self._samples = deque(maxlen=size)
+        self._total = 0
+
+    def add(self, value: float) -> None:
+        """Add a new sample."""
+        self._samples.append(value)
+        self._total += 1
+
+    @property
+    def total(self) -> int:
+        """Return the number of samples ever added."""
+        return self._total
+
+    @property
+    def count(self) -> int:
+        """Return the number of samples currently remembered."""
+        return len(self._samples)
+
+    @property
+    def last(self) -> Optional[float]:
+        """Return the most recent sample."""
+        return self._samples[-1] if self._samples else None
+
+    @property
+    def min(self) -> Optional[float]:
+        """Return the smallest remembered sample."""
+        return min(self._samples) if self._samples else None
+
+    @property
+    def max(self) -> Optional[float]:
+        """Return the largest remembered sample."""
+        return max(self._samples) if self._samples else None
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Return the average of the remembered samples."""
+        return sum(self._samples) / len(self._samples) if self._samples else None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th (0-100) percentile of the remembered samples."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def histogram(self, bounds: List[float]) -> Dict[str, int]:
+        """Return the number of remembered samples in each bucket.
+
+        bounds are the (increasing) upper limits of the buckets,
+        a last bucket counts the samples above the last bound
+        """
+        result = {f"<={bound}": 0 for bound in bounds}
+        result[f">{bounds[-1]}"] = 0
+        for value in self._samples:
+            index = bisect_left(bounds, value)
+            if index < len(bounds):
+                result[f"<={bounds[index]}"] += 1
+            else:
+                result[f">{bounds[-1]}"] += 1
+        return result
+
+    def asDict(self) -> dict:
+        """Return a summary of the samples as a dictionary."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "last": self.last,
+            "min": self.min,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+        }
@@ -0,0 +1,94 @@
+"""A coarse timer wheel running many deadlines on a single event loop timer."""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Hashable
+
+_LOGGER = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+
+
+class TimerWheel:
+    """Run callbacks when their deadline is reached.
+
+    Deadlines are rounded up to the next tick of the wheel
+    (every 'resolution' seconds) and all the deadlines of a given tick
+    are kept together in a slot. Only one timer is armed on the event loop
+    and only while there is at least one deadline pending.
+    """
+
+    def __init__(self, loop=None, resolution: float = 0.5):
+        """Initialize an empty wheel."""
+        self._loop = loop
+        self._resolution = resolution
+
+        # tick number -> { key: callback }
+        self._slots: Dict[int, Dict[Hashable, Callable]] = {}
+        # key -> tick number, for cancellation
+        self._ticks: Dict[Hashable, int] = {}
+
+        self._handle = None
+
+    def __len__(self):
+        """Return the number of pending deadlines."""
+        return len(self._ticks)
+
+    def __contains__(self, key):
+        """Return True if a deadline is pending for that key."""
+        return key in self._ticks
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable) -> None:
+        """Call callback(key) in (at least) delay seconds.
+
+        scheduling again an existing key replaces its deadline
+        """
+        self.cancel(key)
+        tick = math.ceil((time.monotonic() + delay) / self._resolution)
+        self._slots.setdefault(tick, {})[key] = callback
+        self._ticks[key] = tick
+        self._arm()
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the deadline of a key, return True if there was one."""
+        tick = self._ticks.pop(key, None)
+        if tick is None:
+            return False
+        # the slot might be missing if it is currently firing
+        slot = self._slots.get(tick)
+        if slot is not None:
+            del slot[key]
+            if not slot:
+                del self._slots[tick]
+        return True
+
+    def clear(self) -> None:
+        """Cancel all pending deadlines."""
+        self._slots.clear()
+        self._ticks.clear()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _arm(self) -> None:
+        if not self._handle and self._slots:
+            loop = self._loop or asyncio.get_event_loop()
+            self._handle = loop.call_later(self._resolution, self._tick)
+
+    def _tick(self) -> None:
+        """Fire all the deadlines that are due."""
+        self._handle = None
+        now = math.floor(time.monotonic() / self._resolution)
+        for tick in sorted(t for t in self._slots if t <= now):
+            for (key, callback) in self._slots.pop(tick).items():
+                # a previous callback may have cancelled or rescheduled that key
+                if self._ticks.get(key) != tick:
+                    continue
+                del self._ticks[key]
+                try:
+                    callback(key)
+                except Exception as err:
+                    _LOGGER.error(f"TIMERS: exception in callback for {key}: {err}")
+        self._arm()
@@ -221,16 +221,16 @@ class PoolSensor(PoolEntity, SensorEntity):
     def state(self) -> str:
         """Return the state of the sensor."""
 
-        value = str(self._poolObject[self._attribute_key])
-
         # some sensors, like variable speed pumps, can vary constantly
         # so rounding their value to a nearest multiplier of 'rounding'
         # smoothes the curve and limits the number of updates in the log
 
         if self._rounding_factor:
-            value = str(int(round(int(value) / self._rounding_factor) * self._rounding_factor))
+            value = self._poolObject.getValue(self._attribute_key)
+            if isinstance(value, int):
+                return str(round(value / self._rounding_factor) * self._rounding_factor)
 
-        return value
+        return str(self._poolObject[self._attribute_key])
 
     @property
     def native_unit_of_measurement(self) -> Optional[str]:
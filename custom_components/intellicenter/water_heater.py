@@ -43,24 +43,19 @@ async def async_setup_entry(
     # here we try to figure out which heater, if any, can be used for a given
     # body of water
 
-    # first find all heaters
-    # and sort them by their UI order (if they don't have one, use 100 and place them last)
-    heaters = sorted(
-        controller.model.getByType(HEATER_TYPE),
-        key=lambda h: int(h[LISTORD_ATTR]) if h[LISTORD_ATTR] else 100,
-    )
-
-    bodies = controller.model.getByType(BODY_TYPE)
-
     water_heaters = []
     body: PoolObject
-    for body in bodies:
-        heater_list = []
-        heater: PoolObject
-        for heater in heaters:
-            # if the heater supports this body, add it to the list
-            if body.objnam in heater[BODY_ATTR].split(" "):
-                heater_list.append(heater.objnam)
+    for body in controller.model.getByType(BODY_TYPE):
+        # find the heaters supporting this body
+        # and sort them by their UI order (if they don't have one, use 100 and place them last)
+        heater_list = [
+            heater.objnam
+            for heater in sorted(
+                controller.model.getReferencing(BODY_ATTR, body.objnam),
+                key=lambda h: h.getValue(LISTORD_ATTR, 100),
+            )
+            if heater.objtype == HEATER_TYPE
+        ]
         if heater_list:
             water_heaters.append(PoolWaterHeater(entry, controller, body, heater_list))
 
@@ -107,12 +102,10 @@ class PoolWaterHeater(PoolEntity, WaterHeaterEntity, RestoreEntity):
     @property
     def state(self) -> str:
         """Return the current state."""
-        status = self._poolObject[STATUS_ATTR]
-        heater = self._poolObject[HEATER_ATTR]
-        if status == "OFF" or heater == NULL_OBJNAM:
+        body = self._poolObject
+        if body[STATUS_ATTR] == "OFF" or not body.heater:
             return STATE_OFF
-        htmode = self._poolObject[HTMODE_ATTR]
-        return STATE_ON if htmode != "0" else STATE_IDLE
+        return STATE_ON if body.isHeating else STATE_IDLE
 
     @property
     def unique_id(self):
@@ -142,12 +135,12 @@ class PoolWaterHeater(PoolEntity, WaterHeaterEntity, RestoreEntity):
     @property
     def current_temperature(self):
         """Return the current temperature."""
-        return float(self._poolObject[LSTTMP_ATTR])
+        return self._poolObject.temperature
 
     @property
     def target_temperature(self):
         """Return the temperature we try to reach."""
-        return float(self._poolObject[LOTMP_ATTR])
+        return self._poolObject.setPoint
 
     def set_temperature(self, **kwargs):
         """Set new target temperatures."""
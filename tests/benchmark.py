@@ -0,0 +1,345 @@
+"""Micro-benchmarks of the receive path, the codecs and the model.
+
+Run with: python tests/benchmark.py [scale]
+(scale multiplies the size of each benchmark, 1 by default)
+
+Each one is measured against what the code did before:
+- the framer against the decode, concatenate and split of every read
+- the buffered protocol against the plain one
+- each JSON codec available against the standard json module
+- the load of a snapshot against the discovery of the same objects
+- the shared attribute names and objnam against private copies
+- the index lookups against a scan of the model
+"""
+
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, str(Path(__file__).parent.parent / "custom_components" / "intellicenter")
+)
+
+from pyintellicenter import model as modelModule  # noqa: E402
+from pyintellicenter.codec import CODECS, getCodec  # noqa: E402
+from pyintellicenter.model import PoolModel  # noqa: E402
+from pyintellicenter.protocol import (  # noqa: E402
+    ICBufferedProtocol,
+    ICProtocol,
+    LineFramer,
+)
+
+# the size of the reads from the socket (a TCP segment)
+CHUNK_SIZE = 1460
+
+# the number of lines received and of objects in the model (at scale 1)
+NUM_LINES = 20000
+NUM_OBJECTS = 1000
+
+# the attributes of a circuit as notified by a system
+CIRCUIT_PARAMS = {
+    "OBJTYP": "CIRCUIT",
+    "SUBTYP": "GENERIC",
+    "SNAME": "Circuit",
+    "STATUS": "OFF",
+    "PARENT": "00000",
+    "FEATR": "ON",
+    "USE": "WHITER",
+    "LIMIT": "12",
+    "TIME": "720",
+    "FREEZE": "OFF",
+    "DNTSTP": "OFF",
+    "CHILD": "00000",
+    "HNAME": "C0001",
+    "LISTORD": "1",
+    "SHOMNU": "fcsrepvhzmtl",
+}
+
+
+def objnam(index: int) -> str:
+    """Return the objnam of the index-th object."""
+    return f"C{index:04}"
+
+
+def notification(index: int) -> bytes:
+    """Return the line of a NotifyList of a few attributes."""
+    return (
+        b'{"command":"NotifyList","messageID":"%d","objectList":[{"objnam":"%s",'
+        b'"params":{"STATUS":"%s","RPM":"%d","PWR":"%d"}}]}\r\n'
+        % (
+            index,
+            objnam(index % 100).encode(),
+            b"ON" if index % 2 else b"OFF",
+            index,
+            index,
+        )
+    )
+
+
+def received(numLines: int, size: int = CHUNK_SIZE) -> list:
+    """Return notifications as the reads of a socket."""
+    data = b"".join(notification(index) for index in range(numLines))
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+def timed(function, *args) -> float:
+    """Return the time (in seconds) a call takes, best of 3."""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def discoveredObjects(numObjects: int, separately: bool = False) -> list:
+    """Return the objects of a system as decoded from a message.
+
+    json shares the keys within a document, so decode each object
+    separately to have them received in different messages
+    """
+    codec = getCodec("json")
+    objects = [
+        {"objnam": objnam(index), "params": dict(CIRCUIT_PARAMS)}
+        for index in range(numObjects)
+    ]
+    if separately:
+        return [codec.loads(codec.dumps(object)) for object in objects]
+    return codec.loads(codec.dumps(objects))
+
+
+# ---------------------------------------------------------------------------
+
+
+def benchFramer(scale: float = 1) -> dict:
+    """Split lines from socket reads: the framer and the previous buffering."""
+
+    numLines = int(NUM_LINES * scale)
+    chunks = received(numLines)
+    size = sum(len(chunk) for chunk in chunks)
+
+    def previous():
+        # decode each read, wait for a read ending with a separator, split
+        numLines = 0
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk.decode()
+            if not buffer.endswith("\r\n"):
+                continue
+            lines = buffer.split("\r\n")
+            buffer = ""
+            numLines += sum(1 for line in lines if line)
+        return numLines
+
+    def framer():
+        framer = LineFramer()
+        return sum(len(framer.feed(chunk)) for chunk in chunks)
+
+    # the previous buffering held the complete lines until a read
+    # happened to end with a separator, the framer dispatches them at once
+    numWaits = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode()
+        if buffer.endswith("\r\n"):
+            buffer = ""
+        else:
+            numWaits += buffer.count("\r\n")
+
+    return {
+        "bytes": size,
+        "previous mean reads waited per line": numWaits / numLines,
+        "previous MB/s": size / timed(previous) / 1e6,
+        "framer MB/s": size / timed(framer) / 1e6,
+    }
+
+
+class NullController:
+    """A controller ignoring everything."""
+
+    def connection_made(self, protocol, transport):
+        """Ignore the connection."""
+
+    def connection_lost(self, exc):
+        """Ignore the disconnection."""
+
+    def receivedMessage(self, msg_id, command, response, msg):
+        """Ignore the message."""
+
+
+def benchProtocols(scale: float = 1) -> dict:
+    """Receive and decode notifications: plain and buffered protocols."""
+
+    numLines = int(NUM_LINES * scale)
+    chunks = received(numLines)
+
+    def plain():
+        protocol = ICProtocol(NullController(), heartbeatInterval=0)
+        protocol.connection_made(None)
+        for chunk in chunks:
+            protocol.data_received(chunk)
+
+    def buffered():
+        protocol = ICBufferedProtocol(NullController(), heartbeatInterval=0)
+        protocol.connection_made(None)
+        for chunk in chunks:
+            while chunk:
+                buffer = protocol.get_buffer(len(chunk))
+                size = min(len(buffer), len(chunk))
+                buffer[:size] = chunk[:size]
+                protocol.buffer_updated(size)
+                chunk = chunk[size:]
+
+    return {
+        "codec": getCodec().name,
+        "plain lines/s": numLines / timed(plain),
+        "buffered lines/s": numLines / timed(buffered),
+    }
+
+
+def benchCodecs(scale: float = 1) -> dict:
+    """Decode notifications and encode requests with each codec available."""
+
+    lines = [notification(index).rstrip() for index in range(int(NUM_LINES * scale))]
+    request = {
+        "messageID": "1",
+        "command": "RequestParamList",
+        "objectList": [
+            {"objnam": objnam(index), "keys": list(CIRCUIT_PARAMS)}
+            for index in range(10)
+        ],
+    }
+
+    result = {}
+    for name, codecClass in CODECS.items():
+        if not codecClass:
+            continue
+        codec = codecClass()
+        result[f"{name} loads/s"] = len(lines) / timed(
+            lambda: [codec.loads(line) for line in lines]
+        )
+        result[f"{name} dumps/s"] = len(lines) / timed(
+            lambda: [codec.dumps(request) for _ in lines]
+        )
+    return result
+
+
+def benchSnapshot(scale: float = 1) -> dict:
+    """Populate a model: from a snapshot and from the discovered objects."""
+
+    numObjects = int(NUM_OBJECTS * scale)
+    objects = discoveredObjects(numObjects)
+    model = PoolModel()
+    model.addObjects(objects)
+    codec = getCodec()
+    stored = codec.dumps(model.snapshot())
+
+    def fromSnapshot():
+        PoolModel().loadSnapshot(codec.loads(stored))
+
+    def fromDiscovery():
+        PoolModel().addObjects(discoveredObjects(numObjects))
+
+    return {
+        "objects": numObjects,
+        "snapshot bytes": len(stored),
+        "snapshot load ms": timed(fromSnapshot) * 1000,
+        # includes the decoding of the objects, as received
+        "discovery ms": timed(fromDiscovery) * 1000,
+    }
+
+
+def benchInterning(scale: float = 1) -> dict:
+    """Memory of the model: with shared and with private attribute names."""
+
+    numObjects = int(NUM_OBJECTS * scale)
+    numUpdates = 5 * numObjects
+    codec = getCodec("json")
+    lines = [
+        codec.dumps(
+            {"objnam": objnam(index % numObjects), "params": {"STATUS": str(index)}}
+        )
+        for index in range(numUpdates)
+    ]
+
+    def measure():
+        # the messages are decoded while traced, and released once processed
+        # so that only what the model keeps of them is counted
+        tracemalloc.start()
+        model = PoolModel()
+        model.addObjects(discoveredObjects(numObjects, separately=True))
+        loaded = tracemalloc.get_traced_memory()[0]
+        # each notification decoded on its own, as received
+        model.processUpdates([codec.loads(line) for line in lines])
+        updated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return (loaded, updated)
+
+    shared = measure()
+    intern = modelModule.intern
+    try:
+        modelModule.intern = lambda name: name
+        private = measure()
+    finally:
+        modelModule.intern = intern
+
+    return {
+        "objects": numObjects,
+        "private names KB": private[0] / 1024,
+        "shared names KB": shared[0] / 1024,
+        # the change log then holds the changes of the last updates
+        f"private names after {numUpdates} updates KB": private[1] / 1024,
+        f"shared names after {numUpdates} updates KB": shared[1] / 1024,
+    }
+
+
+def benchIndexes(scale: float = 1) -> dict:
+    """Children of every object: the index against a scan of the model."""
+
+    result = {}
+    for numObjects in (10, 100, int(NUM_OBJECTS * scale)):
+        objects = discoveredObjects(numObjects)
+        for index, object in enumerate(objects):
+            # a tree of circuits
+            object["params"]["PARENT"] = objnam(index // 4) if index else "00000"
+        model = PoolModel()
+        model.addObjects(objects)
+
+        def scan():
+            for parent in model:
+                [object for object in model if object["PARENT"] == parent.objnam]
+
+        def indexed():
+            for parent in model:
+                model.getChildren(parent)
+
+        result[f"{numObjects} scan ms"] = timed(scan) * 1000
+        result[f"{numObjects} index ms"] = timed(indexed) * 1000
+    return result
+
+
+BENCHMARKS = [
+    benchFramer,
+    benchProtocols,
+    benchCodecs,
+    benchSnapshot,
+    benchInterning,
+    benchIndexes,
+]
+
+
+def main():
+    """Run all the benchmarks and print their results."""
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    for benchmark in BENCHMARKS:
+        print(f"{benchmark.__name__}: {benchmark.__doc__}")
+        for name, value in benchmark(scale).items():
+            if isinstance(value, float):
+                value = f"{value:,.2f}"
+            print(f"    {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Test configuration."""
+
+from pathlib import Path
+import sys
+
+# pyintellicenter only depends on the standard library: it is tested on its own,
+# without Home Assistant (needed to import the integration package)
+sys.path.insert(
+    0, str(Path(__file__).parent.parent / "custom_components" / "intellicenter")
+)
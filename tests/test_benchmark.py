@@ -0,0 +1,13 @@
+"""Run the micro-benchmarks at a small scale so that they keep working."""
+
+import pytest
+
+from benchmark import BENCHMARKS
+
+
+@pytest.mark.parametrize("benchmark", BENCHMARKS, ids=lambda b: b.__name__)
+def test_benchmark(benchmark):
+    """A benchmark runs and measures something."""
+    results = benchmark(0.01)
+    assert results
+    assert all(value is not None for value in results.values())
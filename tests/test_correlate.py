@@ -0,0 +1,282 @@
+"""Replay of error exchanges where IntelliCenter answers with a wrong messageID."""
+
+import asyncio
+import json
+
+import pytest
+
+from pyintellicenter import BaseController, CommandError
+from pyintellicenter.protocol import ICProtocol
+
+# each exchange is the requests sent (their messageID is generated from "1")
+# and the lines received from the system, in that order, then the messageIDs
+# the responses are matched to, how many by order and how many requests
+# are left on the wire
+EXCHANGES = {
+    # an error answered with a messageID matching nothing
+    "wrong id": (
+        1,
+        [("GetParamList", {"condition": "", "objectList": []})],
+        [
+            {
+                "command": "SendParamList",
+                "messageID": "66ab5e36-8d14-4b2a-bc6f-3b8e8ca3d1bc",
+                "response": "400",
+            }
+        ],
+        ["1"],
+        1,
+        0,
+    ),
+    # the error is for the oldest request it can answer, not the oldest one
+    "compatible command": (
+        3,
+        [
+            ("GetQuery", {"queryName": "GetHardwareDefinition", "arguments": ""}),
+            ("SETPARAMLIST", {"objectList": []}),
+            ("GetParamList", {"condition": "", "objectList": []}),
+        ],
+        [
+            {"command": "SendParamList", "messageID": "x17", "response": "404"},
+            {"command": "SendQuery", "messageID": "1", "response": "200"},
+            {"command": "SETPARAMLIST", "messageID": "2", "response": "200"},
+        ],
+        ["3", "1", "2"],
+        1,
+        0,
+    ),
+    # an 'Error' command says nothing about the request: the oldest one
+    "error command": (
+        2,
+        [
+            ("GetParamList", {"condition": "", "objectList": []}),
+            ("SETPARAMLIST", {"objectList": []}),
+        ],
+        [
+            {"command": "Error", "messageID": "0", "response": "400"},
+            {"command": "SETPARAMLIST", "messageID": "2", "response": "200"},
+        ],
+        ["1", "2"],
+        1,
+        0,
+    ),
+    # no request on the wire can be answered by that command: left unmatched
+    # and the request keeps its slot until answered (or timed out)
+    "no compatible request": (
+        1,
+        [("GetParamList", {"condition": "", "objectList": []})],
+        [{"command": "SendQuery", "messageID": "x3", "response": "400"}],
+        ["x3"],
+        0,
+        1,
+    ),
+    # an error with the right messageID needs no matching
+    "right id": (
+        2,
+        [
+            ("GetParamList", {"condition": "", "objectList": []}),
+            ("GetParamList", {"condition": "", "objectList": []}),
+        ],
+        [
+            {"command": "SendParamList", "messageID": "2", "response": "400"},
+            {"command": "SendParamList", "messageID": "1", "response": "200"},
+        ],
+        ["2", "1"],
+        0,
+        0,
+    ),
+}
+
+
+class FakeTransport(asyncio.Transport):
+    """A transport recording what is written."""
+
+    def __init__(self):
+        """Initialize."""
+        super().__init__()
+        self.written = []
+
+    def write(self, data):
+        """Record the data written."""
+        self.written.append(data)
+
+    def get_write_buffer_size(self):
+        """Return the size of the write buffer, always empty."""
+        return 0
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """Ignore the limits."""
+
+    def close(self):
+        """Close the transport."""
+
+    def is_closing(self):
+        """Return False, the transport is never closed."""
+        return False
+
+
+class RecordingController:
+    """The part of a controller the protocol talks to."""
+
+    def __init__(self):
+        """Initialize."""
+        self.received = []
+
+    def connection_made(self, protocol, transport):
+        """Ignore the connection."""
+
+    def connection_lost(self, exc):
+        """Ignore the disconnection."""
+
+    def requestSent(self, msg_id):
+        """Ignore the request sent."""
+
+    def requestDropped(self, msg_id, error):
+        """Ignore the request dropped."""
+
+    def receivedMessage(self, msg_id, command, response, msg):
+        """Record the messageID a message was matched to."""
+        self.received.append(msg_id)
+
+
+def line(message: dict) -> bytes:
+    """Return a message as received from the system."""
+    return json.dumps(message).encode() + b"\r\n"
+
+
+@pytest.mark.parametrize("name", EXCHANGES)
+def test_replay(name):
+    """Replay an exchange and check each response is matched to its request."""
+    window, requests, responses, expected, numCorrelated, inFlight = EXCHANGES[name]
+
+    async def replay():
+        controller = RecordingController()
+        protocol = ICProtocol(controller, maxWindow=window)
+        protocol.connection_made(FakeTransport())
+        # as if the window had already grown up to its maximum
+        protocol._window = float(window)
+
+        for (command, extra) in requests:
+            protocol.sendCmd(command, extra)
+        assert protocol.stats["inFlight"] == len(requests)
+
+        for response in responses:
+            protocol.data_received(line(response))
+
+        assert controller.received == expected
+        assert protocol.stats["correlated"] == numCorrelated
+        assert protocol.stats["inFlight"] == inFlight
+        protocol.connection_lost(None)
+
+    asyncio.run(replay())
+
+
+def test_error_fails_request_right_away():
+    """The Future of a request answered with a wrong messageID fails at once."""
+
+    class ReplayLoop:
+        """A loop whose connections are made to a FakeTransport."""
+
+        def __init__(self, loop):
+            """Initialize."""
+            self._loop = loop
+            self.protocol = None
+
+        def __getattr__(self, name):
+            """Delegate to the real loop."""
+            return getattr(self._loop, name)
+
+        async def create_connection(self, protocolFactory, host, port):
+            """Connect a new protocol to a FakeTransport."""
+            transport = FakeTransport()
+            self.protocol = protocolFactory()
+            self.protocol.connection_made(transport)
+            return (transport, self.protocol)
+
+    async def replay():
+        loop = ReplayLoop(asyncio.get_running_loop())
+        controller = BaseController("127.0.0.1", loop=loop, maxInFlight=2)
+        await controller._connect()
+        loop.protocol._window = 2.0
+
+        first = controller.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        second = controller.sendCmd(
+            "GetQuery", {"queryName": "GetHardwareDefinition", "arguments": ""}
+        )
+
+        loop.protocol.data_received(
+            line({"command": "SendQuery", "messageID": "x9", "response": "406"})
+        )
+        await asyncio.sleep(0)
+        assert isinstance(second.exception(), CommandError)
+        assert second.exception().errorCode == "406"
+        assert not first.done()
+
+        loop.protocol.data_received(
+            line({"command": "SendParamList", "messageID": "1", "response": "200"})
+        )
+        await asyncio.sleep(0)
+        assert first.result()["response"] == "200"
+        assert controller.requestStats["orphaned"] == 0
+        controller.stop()
+
+    asyncio.run(replay())
+
+
+def test_late_response_of_expired_request():
+    """The late response of a request that timed out releases no other slot."""
+
+    async def replay():
+        controller = RecordingController()
+        protocol = ICProtocol(controller, maxWindow=2)
+        protocol.connection_made(FakeTransport())
+        protocol._window = 2.0
+
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol.requestTimedOut("1")
+        assert protocol.stats["inFlight"] == 1
+
+        protocol.data_received(
+            line({"command": "SendParamList", "messageID": "1", "response": "200"})
+        )
+        assert [request.msg_id for request in protocol._onWire] == ["2"]
+        assert protocol.stats["inFlight"] == 1
+
+        protocol.data_received(
+            line({"command": "SendParamList", "messageID": "2", "response": "200"})
+        )
+        assert protocol.stats["inFlight"] == 0
+        protocol.connection_lost(None)
+
+    asyncio.run(replay())
+
+
+def test_late_error_of_expired_request():
+    """The late error of a request that timed out fails no other request."""
+
+    async def replay():
+        controller = RecordingController()
+        protocol = ICProtocol(controller, maxWindow=2)
+        protocol.connection_made(FakeTransport())
+        protocol._window = 2.0
+
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol.requestTimedOut("1")
+
+        protocol.data_received(
+            line({"command": "SendParamList", "messageID": "1", "response": "400"})
+        )
+        assert controller.received == ["1"]
+        assert protocol.stats["correlated"] == 0
+        assert protocol.stats["inFlight"] == 1
+
+        protocol.data_received(
+            line({"command": "SendParamList", "messageID": "2", "response": "200"})
+        )
+        assert controller.received == ["1", "2"]
+        assert protocol.stats["inFlight"] == 0
+        protocol.connection_lost(None)
+
+    asyncio.run(replay())
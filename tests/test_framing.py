@@ -0,0 +1,80 @@
+"""Lines of the maximum length, and longer ones, split by both receive paths."""
+
+import asyncio
+
+import pytest
+
+from pyintellicenter.protocol import ICBufferedProtocol, ICProtocol
+
+MAX_LINE_LENGTH = 64
+
+
+class RecordingController:
+    """The part of a controller the protocol talks to."""
+
+    def __init__(self):
+        """Initialize."""
+        self.lines = []
+
+    def connection_made(self, protocol, transport):
+        """Ignore the connection."""
+
+    def connection_lost(self, exc):
+        """Ignore the disconnection."""
+
+
+class Recording:
+    """Record the lines processed instead of decoding them."""
+
+    def processMessage(self, message):
+        """Record a line."""
+        self._controller.lines.append(bytes(message))
+
+
+class RecordingProtocol(Recording, ICProtocol):
+    """An ICProtocol recording its lines."""
+
+
+class RecordingBufferedProtocol(Recording, ICBufferedProtocol):
+    """An ICBufferedProtocol recording its lines."""
+
+
+def feed(protocol, data: bytes, chunkSize: int) -> None:
+    """Pass data to the protocol in chunks, as a transport would."""
+    for start in range(0, len(data), chunkSize):
+        chunk = data[start : start + chunkSize]
+        if isinstance(protocol, asyncio.BufferedProtocol):
+            while chunk:
+                buffer = protocol.get_buffer(len(chunk))
+                size = min(len(buffer), len(chunk))
+                buffer[:size] = chunk[:size]
+                protocol.buffer_updated(size)
+                chunk = chunk[size:]
+        else:
+            protocol.data_received(chunk)
+
+
+@pytest.mark.parametrize(
+    "protocolClass", [RecordingProtocol, RecordingBufferedProtocol]
+)
+@pytest.mark.parametrize("chunkSize", [1, 7, 1000])
+def test_line_lengths(protocolClass, chunkSize):
+    """Lines up to the maximum length are kept, longer ones are counted and dropped."""
+    controller = RecordingController()
+    kwargs = {"bufferSize": 16} if protocolClass is RecordingBufferedProtocol else {}
+    protocol = protocolClass(
+        controller, maxLineLength=MAX_LINE_LENGTH, heartbeatInterval=0, **kwargs
+    )
+    protocol.connection_made(asyncio.Transport())
+
+    lines = [
+        b"a" * (MAX_LINE_LENGTH - 1),
+        b"b" * MAX_LINE_LENGTH,
+        b"c" * (2 * MAX_LINE_LENGTH),
+        b"d",
+    ]
+    feed(protocol, b"".join(line + b"\r\n" for line in lines), chunkSize)
+
+    expected = [line for line in lines if len(line) <= MAX_LINE_LENGTH]
+    assert controller.lines == expected
+    assert protocol.numDiscarded == len(lines) - len(expected)
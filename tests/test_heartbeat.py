@@ -0,0 +1,92 @@
+"""The round trip time of the pings queued behind other requests."""
+
+import asyncio
+import time
+
+from pyintellicenter.protocol import OVERFLOW_DROP_OLDEST, PRIORITY_QUERY, ICProtocol
+
+
+class Transport(asyncio.Transport):
+    """A transport accepting everything written."""
+
+    def write(self, data):
+        """Ignore the data written."""
+
+    def get_write_buffer_size(self):
+        """Return the size of the write buffer, always empty."""
+        return 0
+
+    def close(self):
+        """Close the transport."""
+
+
+class Controller:
+    """The part of a controller the protocol talks to."""
+
+    def connection_made(self, protocol, transport):
+        """Ignore the connection."""
+
+    def connection_lost(self, exc):
+        """Ignore the disconnection."""
+
+    def requestSent(self, msg_id):
+        """Ignore the request sent."""
+
+    def requestDropped(self, msg_id, error):
+        """Ignore the request dropped."""
+
+    def receivedMessage(self, msg_id, command, response, msg):
+        """Ignore the message."""
+
+
+def connect(**kwargs) -> ICProtocol:
+    """Return a protocol connected and idle for long enough to ping."""
+    protocol = ICProtocol(Controller(), heartbeatInterval=10, **kwargs)
+    protocol.connection_made(Transport())
+    protocol._lastReceived -= 20
+    return protocol
+
+
+def test_rtt_starts_when_the_ping_is_written():
+    """The time a ping waits in the queue is not part of its round trip."""
+
+    async def run():
+        protocol = connect()
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol._heartbeat()
+        assert protocol.rttStats["unacknowledged"] == 1
+        assert not protocol._pingTimes
+
+        protocol.data_received(
+            b'{"command": "SendParamList", "messageID": "1", "response": "200"}\r\n'
+        )
+        assert len(protocol._pingTimes) == 1
+        sentAt = protocol._pingTimes[0]
+        assert sentAt == protocol._onWire[0].sentAt
+
+        protocol.data_received(b"pong\r\n")
+        assert protocol.rttStats["unacknowledged"] == 0
+        assert protocol.rttStats["max"] <= time.monotonic() - sentAt
+        protocol.connection_lost(None)
+
+    asyncio.run(run())
+
+
+def test_dropped_ping_is_not_unacknowledged():
+    """A ping dropped from a full queue expects no pong."""
+
+    async def run():
+        protocol = connect(maxQueueSize=1, overflowPolicy=OVERFLOW_DROP_OLDEST)
+        protocol.sendCmd("GetParamList", {"condition": "", "objectList": []})
+        protocol._heartbeat()
+        protocol.sendCmd("GetQuery", {"queryName": "x"}, priority=PRIORITY_QUERY)
+        assert protocol.stats["dropped"] == 1
+        assert protocol.rttStats["unacknowledged"] == 0
+
+        protocol.data_received(
+            b'{"command": "SendParamList", "messageID": "1", "response": "200"}\r\n'
+        )
+        assert not protocol._pingTimes
+        protocol.connection_lost(None)
+
+    asyncio.run(run())